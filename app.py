@@ -1,54 +1,131 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-import boto3
-from boto3.dynamodb.conditions import Key, Attr
-from botocore.exceptions import ClientError
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, make_response
 import uuid
+import json
+import base64
+import functools
+import hashlib
+import math
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from bcrypt import hashpw, gensalt, checkpw
+from decimal import Decimal
 import os
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
+from session_store import ServerSideSessionInterface, SqliteSessionStore, MemorySessionStore
+from metrics import Metrics
+import app_logging
+import logging
+from password_hasher import PasswordHasher, HasherBusy
+from search import SearchIndex
+from assets import AssetPipeline
+from images import ImageStore
+from write_behind import WriteBehindQueue, SpoolFull
+from streaming import ResponseCompressor, stream_page
+from rate_limit import RateLimiter, MemoryBucketStore, SqliteBucketStore, parse_limits
+from recipes import RecipeBook
+from repositories import (
+    create_repositories, DuplicateOrderError, OutOfStockError, PriceChangedError, MAX_CART_QUANTITY,
+    MAX_TRANSACT_ITEMS
+)
 import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
 
+# LOG_LEVEL / LOG_FORMAT (json or text) / LOG_SAMPLE (event=rate,...);
+# see app_logging. Password hash workers re-run this file as __mp_main__ under
+# `python app.py` (see password_hasher.py); they only hash, so they skip the
+# logging thread.
+if __name__ != '__mp_main__':
+    app_logging.configure_logging(
+        level=os.getenv('LOG_LEVEL', 'INFO'),
+        fmt=os.getenv('LOG_FORMAT', 'json'),
+        sample_rates=app_logging.parse_sample_rates(os.getenv('LOG_SAMPLE', 'cart.add=0.1'))
+    )
+log = logging.getLogger('freshbasket')
+
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', os.urandom(24))
+app_logging.init_app(app)
+
+# TRUSTED_PROXIES is how many proxies (load balancer, nginx, ...) sit in front
+# of the app. Their X-Forwarded-For/-Proto entries give the client's address
+# (which rate limits are keyed on) and scheme; anything a client adds beyond
+# those hops is ignored. Leave at 0 when clients connect directly, or they
+# could pick their own address.
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', '0'))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+# Keep session data server-side; the cookie only carries a signed session id.
+# SESSION_BACKEND=cookie restores Flask's default signed-cookie sessions.
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+SESSION_TTL = int(os.getenv('SESSION_TTL', str(7 * 24 * 3600)))
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', '100000'))
+
+if SESSION_BACKEND == 'sqlite':
+    app.session_interface = ServerSideSessionInterface(
+        SqliteSessionStore(os.getenv('SESSION_DB_PATH', os.path.join(app.root_path, 'sessions.db')),
+                           max_sessions=SESSION_MAX_ENTRIES),
+        ttl=SESSION_TTL
+    )
+elif SESSION_BACKEND == 'memory':
+    app.session_interface = ServerSideSessionInterface(
+        MemorySessionStore(max_sessions=SESSION_MAX_ENTRIES), ttl=SESSION_TTL
+    )
+
+# Per-route latency and DynamoDB call accounting, exported at /metrics.
+# SLOW_REQUEST_MS logs the DynamoDB call trace of requests slower than that.
+metrics = Metrics(
+    slow_request_seconds=float(os.environ['SLOW_REQUEST_MS']) / 1000 if os.getenv('SLOW_REQUEST_MS') else None
+)
+metrics.init_app(app)
+
+# bcrypt runs on a process pool so login bursts don't starve page requests.
+# BCRYPT_ROUNDS is the cost for new hashes; older hashes are upgraded on login.
+# Past PASSWORD_HASH_QUEUE queued hashes, login/register answer 503 at once.
+password_hasher = PasswordHasher(
+    rounds=int(os.getenv('BCRYPT_ROUNDS', '12')),
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+    max_pending=int(os.getenv('PASSWORD_HASH_QUEUE', '16'))
+)
+
+# style.css/main.js are minified, content-hashed and precompressed by
+# `flask --app app build-assets` at deploy time; the app loads that build and
+# url_for('static', ...) resolves to the hashed names (see assets.py). Without
+# a build, or with ASSET_PIPELINE=0, the source files are served as they are.
+assets = AssetPipeline(app.static_folder)
+if os.getenv('ASSET_PIPELINE', '1') != '0':
+    assets.init_app(app)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Minify, fingerprint and precompress the static assets."""
+    assets.build()
 
 @app.context_processor
 def inject_now():
     return {'now': datetime.now()}
 
 # ============================================================================
-# AWS DYNAMODB SETUP
+# STORAGE SETUP
 # ============================================================================
 
-print("\n" + "="*70)
-print("🗄️  Connecting to AWS DynamoDB...")
-print("="*70)
+# STORAGE_BACKEND picks where data lives: dynamodb (production), sqlite (a
+# local file, for edge/dev nodes) or memory (tests and benchmarks). Routes
+# only ever talk to ``repos``; see the repositories package.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'dynamodb')
+SCAN_SEGMENTS = int(os.getenv('SCAN_SEGMENTS', '1'))
 
-# Initialize DynamoDB
-try:
-    dynamodb = boto3.resource(
-        'dynamodb',
-        region_name=os.getenv('AWS_REGION', 'ap-south-1'),
-        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-    )
-
-    dynamodb_client = boto3.client(
-        'dynamodb',
-        region_name=os.getenv('AWS_REGION', 'ap-south-1'),
-        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-    )
-    
-    print("✅ Connected to AWS DynamoDB successfully!")
-    print(f"📍 Region: {os.getenv('AWS_REGION', 'ap-south-1')}")
-except Exception as e:
-    print(f"❌ Error connecting to DynamoDB: {e}")
-    exit(1)
-
-print("="*70 + "\n")
+if STORAGE_BACKEND == 'dynamodb':
+    repos = create_repositories('dynamodb', scan_segments=SCAN_SEGMENTS,
+                                instrument_client=metrics.instrument_client)
+elif STORAGE_BACKEND == 'sqlite':
+    repos = create_repositories('sqlite', path=os.getenv('SQLITE_DB_PATH', os.path.join(app.root_path, 'freshbasket.db')))
+else:
+    repos = create_repositories(STORAGE_BACKEND)
 
 # ============================================================================
 # PRODUCT DATA - 30 Products
@@ -151,149 +228,479 @@ PRODUCTS = [
 ]
 
 # ============================================================================
-# CREATE TABLES IF NOT EXISTS
+# DATABASE BOOTSTRAP
 # ============================================================================
 
-def create_tables_if_not_exists():
-    """Create DynamoDB tables if they don't exist"""
-    print("📦 Checking/Creating DynamoDB tables...")
-    
-    try:
-        existing_tables = dynamodb_client.list_tables()['TableNames']
-        print(f"📋 Existing tables: {existing_tables}")
-    except Exception as e:
-        print(f"❌ Error listing tables: {e}")
-        return
-    
-    # Create Products Table
-    if 'FreshBasket_Products' not in existing_tables:
-        print("Creating FreshBasket_Products table...")
-        try:
-            dynamodb.create_table(
-                TableName='FreshBasket_Products',
-                KeySchema=[{'AttributeName': 'product_id', 'KeyType': 'HASH'}],
-                AttributeDefinitions=[{'AttributeName': 'product_id', 'AttributeType': 'S'}],
-                BillingMode='PAY_PER_REQUEST'
-            )
-            print("✅ FreshBasket_Products table created")
-        except Exception as e:
-            print(f"❌ Error creating Products table: {e}")
-    else:
-        print("✅ FreshBasket_Products table already exists")
-    
-    # Create Users Table
-    if 'FreshBasket_Users' not in existing_tables:
-        print("Creating FreshBasket_Users table...")
-        try:
-            dynamodb.create_table(
-                TableName='FreshBasket_Users',
-                KeySchema=[{'AttributeName': 'email', 'KeyType': 'HASH'}],
-                AttributeDefinitions=[{'AttributeName': 'email', 'AttributeType': 'S'}],
-                BillingMode='PAY_PER_REQUEST'
-            )
-            print("✅ FreshBasket_Users table created")
-        except Exception as e:
-            print(f"❌ Error creating Users table: {e}")
-    else:
-        print("✅ FreshBasket_Users table already exists")
-    
-    # Create Cart Table
-    if 'FreshBasket_Cart' not in existing_tables:
-        print("Creating FreshBasket_Cart table...")
-        try:
-            dynamodb.create_table(
-                TableName='FreshBasket_Cart',
-                KeySchema=[
-                    {'AttributeName': 'user_email', 'KeyType': 'HASH'},
-                    {'AttributeName': 'product_id', 'KeyType': 'RANGE'}
-                ],
-                AttributeDefinitions=[
-                    {'AttributeName': 'user_email', 'AttributeType': 'S'},
-                    {'AttributeName': 'product_id', 'AttributeType': 'S'}
-                ],
-                BillingMode='PAY_PER_REQUEST'
-            )
-            print("✅ FreshBasket_Cart table created")
-        except Exception as e:
-            print(f"❌ Error creating Cart table: {e}")
-    else:
-        print("✅ FreshBasket_Cart table already exists")
-    
-    # Create Orders Table
-    if 'FreshBasket_Orders' not in existing_tables:
-        print("Creating FreshBasket_Orders table...")
-        try:
-            dynamodb.create_table(
-                TableName='FreshBasket_Orders',
-                KeySchema=[{'AttributeName': 'order_id', 'KeyType': 'HASH'}],
-                AttributeDefinitions=[{'AttributeName': 'order_id', 'AttributeType': 'S'}],
-                BillingMode='PAY_PER_REQUEST'
-            )
-            print("✅ FreshBasket_Orders table created")
-        except Exception as e:
-            print(f"❌ Error creating Orders table: {e}")
+def init_db():
+    """One-time schema bootstrap: create tables/indexes, wait for them, seed"""
+    log.info("Bootstrapping %s storage", STORAGE_BACKEND)
+    repos.init_schema()
+    seeded = repos.products.seed_if_empty(PRODUCTS)
+    if seeded:
+        log.info("Seeded %d products", seeded)
     else:
-        print("✅ FreshBasket_Orders table already exists")
-    
-    # Create Contact Messages Table
-    if 'FreshBasket_ContactMessages' not in existing_tables:
-        print("Creating FreshBasket_ContactMessages table...")
+        log.info("Products already exist")
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create and seed the storage backend (run once per environment)."""
+    init_db()
+
+# ============================================================================
+# CATALOG CACHE
+# ============================================================================
+
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', '60'))
+CATALOG_CACHE_MAX_ENTRIES = 64
+# After a failed refill, callers get the stale copy for this long before the
+# store is tried again
+CATALOG_RETRY_AFTER = float(os.getenv('CATALOG_RETRY_AFTER', '5'))
+CATALOG_PAGE_SIZE = 100
+
+class CatalogCache:
+    """In-process cache of the active product catalog.
+
+    Entries (the full catalog plus one per category) expire after ``ttl``
+    seconds or as soon as ``version`` is bumped by a product write. Only one
+    thread refills an expired entry; the others wait on the lock and are
+    served the refreshed copy. If the refill fails, the stale copy is kept
+    for ``retry_after`` seconds so waiters share it instead of each trying
+    the store again. Listeners added with ``on_refresh`` are called
+    with every freshly loaded full catalog.
+    """
+
+    def __init__(self, loader, ttl=CATALOG_CACHE_TTL, retry_after=CATALOG_RETRY_AFTER):
+        self._loader = loader
+        self._listeners = []
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (products, loaded_at, version)
+        self._index = None  # (catalog list, {product_id: product})
+        self.version = 0
+        self.size = 0  # products in the last full catalog loaded
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.errors = 0
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry and entry[2] == self.version and time.monotonic() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def _store(self, key, products, loaded_at, version):
+        self._entries.pop(key, None)
+        self._entries[key] = (products, loaded_at, version)
+        # Category keys come from the query string, so keep the map bounded
+        while len(self._entries) > CATALOG_CACHE_MAX_ENTRIES:
+            self._entries.pop(next(iter(self._entries)))
+
+    def _get(self, key, loader):
+        products = self._fresh(key)
+        if products is not None:
+            self.hits += 1
+            return products
+        with self._lock:
+            # Another thread may have refilled while we were waiting
+            products = self._fresh(key)
+            if products is not None:
+                self.hits += 1
+                return products
+            self.misses += 1
+            version = self.version
+            try:
+                products = (loader or self._loader)()
+            except Exception as e:
+                self.errors += 1
+                log.error("Error refreshing product catalog (%s): %s", key, e)
+                # Serve the stale copy rather than an empty shop, and hold it
+                # (as if loaded ``ttl - retry_after`` ago) so the callers
+                # queued behind this one don't each hit the store in turn
+                stale = self._entries.get(key)
+                products = stale[0] if stale else []
+                self._store(key, products, time.monotonic() - max(self.ttl - self.retry_after, 0), version)
+                return products
+            self._store(key, products, time.monotonic(), version)
+            self.refills += 1
+            if key == 'all':
+                self.size = len(products)
+                for listener in self._listeners:
+                    try:
+                        listener(products)
+                    except Exception:
+                        log.exception("Catalog refresh listener failed")
+            return products
+
+    def get_products(self, key='all', loader=None):
+        return list(self._get(key, loader))
+
+    def iter_products(self, key='all', loader=None, page_size=CATALOG_PAGE_SIZE):
+        """The products of ``get_products``, handed out ``page_size`` at a
+        time; nothing is loaded until the first one is asked for"""
+        products = self._get(key, loader)
+        for start in range(0, len(products), page_size):
+            yield from products[start:start + page_size]
+
+    def get_product(self, product_id):
+        """Look up one active product in the cached catalog, or None"""
+        products = self._get('all', None)
+        index = self._index
+        if index is None or index[0] is not products:
+            index = (products, {p['product_id']: p for p in products})
+            self._index = index
+        return index[1].get(str(product_id))
+
+    def on_refresh(self, listener):
+        self._listeners.append(listener)
+        return listener
+
+    def bump_version(self):
+        """Mark every cached entry stale after a product write"""
+        with self._lock:
+            self.version += 1
+            return self.version
+
+    def invalidate(self):
+        """Drop all cached entries so the next read goes to the store"""
+        with self._lock:
+            self._entries.clear()
+            self.version += 1
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'version': self.version,
+            'ttl': self.ttl,
+            'entries': {
+                key: {'products': len(products), 'age_seconds': round(now - loaded_at, 3),
+                      'stale': version != self.version}
+                for key, (products, loaded_at, version) in list(self._entries.items())
+            },
+            'hits': self.hits,
+            'misses': self.misses,
+            'refills': self.refills,
+            'errors': self.errors
+        }
+
+def _scan_active_products():
+    products = repos.products.list_active()
+    for p in products:
+        p['id'] = int(p['product_id'])
+    return products
+
+def _query_category_products(category_key):
+    products = repos.products.list_active_by_category(category_key)
+    for p in products:
+        p['id'] = int(p['product_id'])
+    # The index sorts product_id as a string ('1', '10', '11', ...)
+    products.sort(key=lambda p: p['id'])
+    return products
+
+catalog_cache = CatalogCache(_scan_active_products)
+
+# ============================================================================
+# PRODUCT SEARCH
+# ============================================================================
+
+SEARCH_MAX_RESULTS = 50
+
+# Fed only by catalog cache refreshes, so searching never reads the store
+search_index = SearchIndex()
+catalog_cache.on_refresh(search_index.sync)
+
+# ============================================================================
+# RECIPE SUGGESTIONS
+# ============================================================================
+
+RECIPES_PATH = os.getenv('RECIPES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'recipes.json'))
+RECIPE_CACHE_SIZE = int(os.getenv('RECIPE_CACHE_SIZE', '4096'))
+RECIPE_SUGGESTIONS = 5
+
+recipe_book = RecipeBook.from_file(RECIPES_PATH, cache_size=RECIPE_CACHE_SIZE)
+# Product links follow the catalog the same way the search index does
+catalog_cache.on_refresh(recipe_book.link_products)
+
+# ============================================================================
+# PRODUCT IMAGES
+# ============================================================================
+
+# Product images are fetched once, resized to IMAGE_WIDTHS in WebP and JPEG
+# and served from a local, size-capped cache; see images.py. IMAGE_OFFLINE=1
+# imports them from IMAGE_SOURCE_DIR instead of the product image URLs.
+# IMAGE_CACHE=0 keeps pages on the source URLs and never touches the cache.
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(app.root_path, 'image_cache'))
+IMAGE_CACHE_MAX_MB = float(os.getenv('IMAGE_CACHE_MAX_MB', '200'))
+
+image_store = None
+if os.getenv('IMAGE_CACHE', '1') != '0':
+    image_store = ImageStore(
+        IMAGE_CACHE_DIR,
+        max_bytes=int(IMAGE_CACHE_MAX_MB * 1024 * 1024),
+        widths=[int(w) for w in os.getenv('IMAGE_WIDTHS', '160,320,500').split(',')],
+        offline=os.getenv('IMAGE_OFFLINE', '0') == '1',
+        source_dir=os.getenv('IMAGE_SOURCE_DIR', os.path.join(app.static_folder, 'images'))
+    )
+    image_store.init_app(app)
+    catalog_cache.on_refresh(image_store.schedule)
+else:
+    app.jinja_env.globals['product_image'] = lambda product: None
+
+# ============================================================================
+# CART SUMMARY CACHE
+# ============================================================================
+
+CART_SUMMARY_MAX_USERS = int(os.getenv('CART_SUMMARY_MAX_USERS', '10000'))
+# Other workers' cart writes can't invalidate this process's entries, so an
+# entry is trusted only this long
+CART_SUMMARY_TTL = float(os.getenv('CART_SUMMARY_TTL', '10'))
+
+class CartSummaryCache:
+    """Per-user (item count, subtotal) aggregates for the cart badge.
+
+    Every cart mutation in this process calls ``invalidate(user_email)``;
+    mutations handled by other workers are picked up once the entry is
+    ``ttl`` seconds old. The next summary request recomputes from one cart
+    Query. A recompute that races with an invalidation is discarded instead
+    of caching a stale total, and one that raises caches nothing.
+    """
+
+    def __init__(self, max_users=CART_SUMMARY_MAX_USERS, ttl=CART_SUMMARY_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_email -> (summary dict, computed_at)
+        self._pending = {}  # user_email -> token of the recompute in flight
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_email, compute):
+        with self._lock:
+            entry = self._entries.get(user_email)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(user_email)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            token = object()
+            self._pending[user_email] = token
+        started = time.monotonic()
         try:
-            dynamodb.create_table(
-                TableName='FreshBasket_ContactMessages',
-                KeySchema=[{'AttributeName': 'message_id', 'KeyType': 'HASH'}],
-                AttributeDefinitions=[{'AttributeName': 'message_id', 'AttributeType': 'S'}],
-                BillingMode='PAY_PER_REQUEST'
-            )
-            print("✅ FreshBasket_ContactMessages table created")
-        except Exception as e:
-            print(f"❌ Error creating ContactMessages table: {e}")
-    else:
-        print("✅ FreshBasket_ContactMessages table already exists")
-    
-    print("✅ All tables ready!")
-    print("="*70 + "\n")
+            summary = compute()
+        except Exception:
+            with self._lock:
+                if self._pending.get(user_email) is token:
+                    del self._pending[user_email]
+            raise
+        with self._lock:
+            if self._pending.get(user_email) is token:
+                del self._pending[user_email]
+                self._entries[user_email] = (summary, started)
+                self._entries.move_to_end(user_email)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+        return summary
 
-def seed_products():
-    """Seed products if table is empty"""
-    try:
-        products_table = dynamodb.Table('FreshBasket_Products')
-        response = products_table.scan(Limit=1)
-        
-        if response['Count'] == 0:
-            print("🌱 Seeding 30 products...")
-            with products_table.batch_writer() as batch:
-                for product in PRODUCTS:
-                    batch.put_item(Item=product)
-            print(f"✅ Successfully seeded {len(PRODUCTS)} products!")
+    def invalidate(self, user_email):
+        with self._lock:
+            self._entries.pop(user_email, None)
+            self._pending.pop(user_email, None)
+
+    def stats(self):
+        return {'users': len(self._entries), 'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+def summarize_cart(cart_items):
+    subtotal = sum(Decimal(str(item.get('price', 0))) * int(item.get('quantity', 0)) for item in cart_items)
+    return {
+        'count': len(cart_items),
+        'quantity': sum(int(item.get('quantity', 0)) for item in cart_items),
+        'subtotal': float(subtotal)
+    }
+
+cart_summaries = CartSummaryCache()
+
+# ============================================================================
+# PAGE CACHE
+# ============================================================================
+
+# Catalog pages carry an ETag (a digest of the rendered page), so browsers and
+# CDNs can revalidate with a cheap 304. Anonymous renders are also kept here,
+# so repeat views skip both the store and Jinja. An entry is dropped by the
+# next product write and never outlives the catalog data it was rendered from.
+PAGE_CACHE_TTL = float(os.getenv('PAGE_CACHE_TTL', str(CATALOG_CACHE_TTL)))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv('PAGE_CACHE_MAX_ENTRIES', '1024'))
+
+class PageCache:
+    """Rendered catalog pages for anonymous visitors.
+
+    Keyed by route, view and query args and guest cart size (the only
+    per-visitor thing those pages show). Each entry remembers when its
+    content last changed, so a re-render that comes out identical keeps its
+    ``Last-Modified``.
+    """
+
+    def __init__(self, ttl=PAGE_CACHE_TTL, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (body, etag, last_modified, rendered_at, catalog version)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[4] == version and time.monotonic() - entry[3] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, key, version, body, etag):
+        with self._lock:
+            previous = self._entries.get(key)
+            last_modified = previous[2] if previous and previous[1] == etag else int(time.time())
+            entry = (body, etag, last_modified, time.monotonic(), version)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses}
+
+page_cache = PageCache()
+
+def catalog_page(view):
+    """Serve a catalog page with validators and 304s, from ``page_cache``
+    for anonymous visitors"""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if '_flashes' in session:
+            # A pending flash is shown once, on a fresh render
+            return view(*args, **kwargs)
+        anonymous = not is_logged_in()
+        entry = None
+        if anonymous:
+            key = (request.endpoint, tuple(sorted(kwargs.items())), tuple(sorted(request.args.items(multi=True))),
+                   len(session.get('cart') or []))
+            version = catalog_cache.version
+            entry = page_cache.get(key, version)
+        if entry is not None:
+            response = app.response_class(entry[0], mimetype='text/html')
         else:
-            print("✅ Products already exist in database")
-    except Exception as e:
-        print(f"⚠️  Error seeding products: {e}")
-
-# Initialize tables
-try:
-    create_tables_if_not_exists()
-    print("⏳ Waiting for tables to be active...")
-    time.sleep(3)
-    seed_products()
-except Exception as e:
-    print(f"⚠️  Initialization error: {e}")
-
-# Initialize table references AFTER creation
-users_table = dynamodb.Table('FreshBasket_Users')
-products_table = dynamodb.Table('FreshBasket_Products')
-orders_table = dynamodb.Table('FreshBasket_Orders')
-cart_table = dynamodb.Table('FreshBasket_Cart')
-contact_messages_table = dynamodb.Table('FreshBasket_ContactMessages')
-
-print(f"📊 Table references initialized:")
-print(f"   - Users: {users_table.table_name}")
-print(f"   - Products: {products_table.table_name}")
-print(f"   - Cart: {cart_table.table_name}")
-print(f"   - Orders: {orders_table.table_name}")
-print(f"   - Contact: {contact_messages_table.table_name}")
-print("="*70 + "\n")
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or '_flashes' in session:
+                return response
+            if response.is_streamed:
+                # No validators until the whole page is out; an anonymous
+                # render fills the cache as it streams, for the next visitor
+                if anonymous:
+                    response.response = _cache_streamed_page(response.response, key, version)
+                else:
+                    response.cache_control.private = True
+                response.cache_control.no_cache = True
+                response.vary.add('Cookie')
+                return response
+            etag = hashlib.sha1(response.get_data()).hexdigest()
+            if anonymous:
+                entry = page_cache.put(key, version, response.get_data(), etag)
+            else:
+                response.set_etag(etag)
+        if anonymous:
+            response.set_etag(entry[1])
+            response.last_modified = entry[2]
+        else:
+            # The page shows the signed-in user's name
+            response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+
+    return wrapper
+
+def _cache_streamed_page(chunks, key, version):
+    parts = []
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    finally:
+        chunks.close()
+    # Only a page streamed to the end is stored
+    body = b''.join(parts)
+    page_cache.put(key, version, body, hashlib.sha1(body).hexdigest())
+
+# ============================================================================
+# STREAMED PAGES AND COMPRESSION
+# ============================================================================
+
+# Once the catalog holds STREAM_MIN_PRODUCTS products, product listings are
+# streamed: the page head goes out at once and the cards follow as they are
+# rendered from a paged catalog iterator, so the first byte doesn't wait for
+# the whole list. Smaller catalogs render in one piece and keep their ETags on
+# the first view. Text responses are gzip/brotli-compressed, streamed ones
+# chunk by chunk; COMPRESS_RESPONSES=0 leaves that to a front proxy.
+STREAM_MIN_PRODUCTS = int(os.getenv('STREAM_MIN_PRODUCTS', '200'))
+compressor = ResponseCompressor(
+    min_size=int(os.getenv('COMPRESS_MIN_BYTES', '1024')),
+    gzip_level=int(os.getenv('COMPRESS_GZIP_LEVEL', '6')),
+    brotli_quality=int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+)
+if os.getenv('COMPRESS_RESPONSES', '1') != '0':
+    compressor.init_app(app)
+
+def stream_catalog():
+    """Whether this request's product listing should be streamed. A flash
+    waiting to be shown is popped while rendering, after the session has been
+    saved, so those pages are always rendered whole."""
+    return catalog_cache.size >= STREAM_MIN_PRODUCTS and '_flashes' not in session
+
+# ============================================================================
+# CONCURRENT I/O
+# ============================================================================
+
+# boto3 and sqlite3 only block, so independent reads within one request are
+# overlapped on this shared pool. IO_THREADS bounds the storage calls in
+# flight for the whole process, not per request.
+IO_THREADS = int(os.getenv('IO_THREADS', '32'))
+
+io_pool = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix='io')
+
+def _submit_io(fn, *args):
+    # Copy the request's context so metrics still attribute the calls
+    return io_pool.submit(contextvars.copy_context().run, fn, *args)
+
+def run_concurrently(*calls):
+    """Run ``(fn, *args)`` calls side by side and return their results in order"""
+    futures = [_submit_io(*call) for call in calls]
+    return [future.result() for future in futures]
+
+# ============================================================================
+# WRITE-BEHIND QUEUE
+# ============================================================================
+
+# Fire-and-forget writes (contact messages) are spooled to WRITE_SPOOL_PATH and
+# sent by a background thread in batches of WRITE_FLUSH_SIZE, at least every
+# WRITE_FLUSH_INTERVAL seconds; see write_behind.py. Past WRITE_SPOOL_MAX
+# spooled items, writes go straight to the store again. The flusher starts
+# with create_app() or on a process's first enqueue, so plain ``app:app``
+# servers drain the spool too, while CLI commands never start it.
+write_behind = WriteBehindQueue(
+    os.getenv('WRITE_SPOOL_PATH', os.path.join(app.root_path, 'write_spool.db')),
+    flush_size=int(os.getenv('WRITE_FLUSH_SIZE', '25')),
+    flush_interval=float(os.getenv('WRITE_FLUSH_INTERVAL', '1.0')),
+    max_items=int(os.getenv('WRITE_SPOOL_MAX', '100000'))
+)
+write_behind.register('contact', repos.contacts.add_many)
 
 # ============================================================================
 # UTILITY FUNCTIONS
@@ -303,64 +710,411 @@ def is_logged_in():
     return 'user_email' in session
 
 def get_all_products():
-    try:
-        response = products_table.scan(FilterExpression=Attr('active').eq(True))
-        products = response.get('Items', [])
-        for p in products:
-            p['id'] = int(p['product_id'])
-        return products
-    except Exception as e:
-        print(f"❌ Error getting products: {e}")
-        return []
+    return catalog_cache.get_products()
+
+def get_products_by_category(category):
+    category_key = category.lower()
+    return catalog_cache.get_products(
+        key=f'category:{category_key}',
+        loader=lambda: _query_category_products(category_key)
+    )
 
 def get_product_by_id(product_id):
+    product = catalog_cache.get_product(product_id)
+    if product:
+        return dict(product)
+    # Not in the active catalog (or the cache is cold); ask the store directly
     try:
-        response = products_table.get_item(Key={'product_id': str(product_id)})
-        product = response.get('Item')
+        product = repos.products.get(product_id)
         if product:
             product['id'] = int(product['product_id'])
         return product
     except Exception as e:
-        print(f"❌ Error getting product: {e}")
+        log.error("Error getting product %s: %s", product_id, e)
         return None
 
+def get_user_profile(user_email):
+    try:
+        return repos.users.get(user_email) or {}
+    except Exception as e:
+        log.error("Error getting user: %s", e)
+        return {}
+
+def load_user_cart(user_email):
+    """The user's cart rows at today's catalog prices; raises if the store
+    can't be read"""
+    items = repos.carts.list(user_email)
+    for item in items:
+        item['id'] = int(item['product_id'])
+        # A cart row keeps the price from when it was first added
+        product = catalog_cache.get_product(item['product_id'])
+        if product:
+            item['price'] = product['price']
+    return items
+
 def get_user_cart(user_email):
     try:
-        response = cart_table.query(KeyConditionExpression=Key('user_email').eq(user_email))
-        items = response.get('Items', [])
-        for item in items:
-            item['id'] = int(item['product_id'])
-        return items
+        return load_user_cart(user_email)
     except Exception as e:
-        print(f"❌ Error getting cart: {e}")
+        log.error("Error getting cart: %s", e)
         return []
 
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def add_to_user_cart(user_email, product, quantity):
+    """Add to a stored cart in one round trip, without a read first"""
+    repos.carts.add(user_email, product, quantity, _now())
+    cart_summaries.invalidate(user_email)
+
+def add_many_to_user_cart(user_email, lines):
+    """Apply ``[(product, quantity), ...]`` to a stored cart in one transaction"""
+    repos.carts.add_many(user_email, lines, _now())
+    cart_summaries.invalidate(user_email)
+
+def set_user_cart_quantities(user_email, changes):
+    """Set quantities on a stored cart in one transaction.
+
+    ``changes`` is ``[(product_id, product, quantity), ...]``; a zero quantity
+    deletes the row (``product`` may then be None).
+    """
+    repos.carts.set_quantities(user_email, changes, _now())
+    cart_summaries.invalidate(user_email)
+
+def remove_from_user_cart(user_email, product_id):
+    repos.carts.remove(user_email, product_id)
+    cart_summaries.invalidate(user_email)
+
+def add_to_session_cart(cart, product, quantity):
+    """Guest carts keep only product ids and quantities; see hydrate_session_cart"""
+    existing = next((i for i in cart if i['id'] == int(product['product_id'])), None)
+    if existing:
+        existing['quantity'] = min(existing['quantity'] + quantity, MAX_CART_QUANTITY)
+    else:
+        cart.append({'id': int(product['product_id']), 'quantity': quantity})
+
+def set_session_cart_quantities(cart, changes):
+    """Session counterpart of set_user_cart_quantities; returns the new cart"""
+    quantities = {product_id: quantity for product_id, _, quantity in changes}
+    updated = []
+    for line in cart:
+        product_id = str(line['id'])
+        quantity = quantities.pop(product_id, line['quantity'])
+        if quantity:
+            updated.append({'id': line['id'], 'quantity': quantity})
+    for product_id, quantity in quantities.items():
+        if quantity:
+            updated.append({'id': int(product_id), 'quantity': quantity})
+    return updated
+
+def get_products_by_ids(product_ids):
+    """``{product_id: product}`` from the catalog cache, fetching any misses
+    (e.g. inactive products) from the store in one batch"""
+    found = {}
+    missing = []
+    for product_id in dict.fromkeys(str(p) for p in product_ids):
+        product = catalog_cache.get_product(product_id)
+        if product:
+            found[product_id] = dict(product)
+        else:
+            missing.append(product_id)
+    if missing:
+        try:
+            found.update(repos.products.get_many(missing))
+        except Exception as e:
+            log.error("Error getting products: %s", e)
+    return found
+
+def hydrate_session_cart(cart):
+    """Fill guest cart lines in with product details from the catalog"""
+    products = get_products_by_ids(line['id'] for line in cart)
+    items = []
+    for line in cart:
+        product = products.get(str(line['id']))
+        if not product:
+            continue
+        items.append({
+            'id': int(product['product_id']),
+            'product_id': product['product_id'],
+            'name': product['name'],
+            'price': product['price'],
+            'unit': product['unit'],
+            'quantity': line['quantity'],
+            'image': product['image']
+        })
+    return items
+
+def merge_guest_cart(user_email, guest_cart):
+    """Fold a cookie (guest) cart into the user's stored cart.
+
+    Quantities for products already in the stored cart are summed; the merged
+    rows are written in one batch. Raises if the stored cart can't be read,
+    since writing the guest quantities alone would overwrite its rows.
+    """
+    if not guest_cart:
+        return 0
+    stored_rows, products = run_concurrently(
+        (load_user_cart, user_email),
+        (get_products_by_ids, [line['id'] for line in guest_cart])
+    )
+    stored = {item['product_id']: item for item in stored_rows}
+    merged = {}
+    for line in guest_cart:
+        product_id = str(line['id'])
+        quantity = int(line.get('quantity', 0))
+        if quantity <= 0:
+            continue
+        row = merged.get(product_id) or stored.get(product_id)
+        if row:
+            row = dict(row)
+            row.pop('id', None)
+            row['quantity'] = min(int(row['quantity']) + quantity, MAX_CART_QUANTITY)
+        else:
+            product = products.get(product_id)
+            if not product:
+                continue
+            row = {
+                'user_email': user_email,
+                'product_id': product_id,
+                'name': product['name'],
+                'price': Decimal(str(product['price'])),
+                'unit': product['unit'],
+                'quantity': min(quantity, MAX_CART_QUANTITY),
+                'image': product['image'],
+                'added_at': _now()
+            }
+        merged[product_id] = row
+    repos.carts.put_many(list(merged.values()))
+    cart_summaries.invalidate(user_email)
+    return len(merged)
+
+def parse_cart_quantity(value, default=1, allow_zero=False):
+    try:
+        quantity = int(value if value is not None else default)
+    except (TypeError, ValueError):
+        return None
+    minimum = 0 if allow_zero else 1
+    return quantity if minimum <= quantity <= MAX_CART_QUANTITY else None
+
 def init_cart():
     if not is_logged_in() and 'cart' not in session:
         session['cart'] = []
 
+def auth_busy(template):
+    """503 for a login/register turned away because the hash queue is full"""
+    log.warning("Password hashing busy, turning request away", extra={'event': 'auth.busy'})
+    flash("We're handling a lot of sign-ins right now. Please try again in a moment.", "danger")
+    response = make_response(render_template(template, is_logged_in=is_logged_in()), 503)
+    response.headers['Retry-After'] = '1'
+    return response
+
+def upgrade_password_hash(email, password):
+    """Re-hash at the configured cost after a successful login; a failure
+    here must never block the login itself"""
+    try:
+        repos.users.update_password(email, password_hasher.hash(password))
+        log.info("Upgraded password hash to cost %d", password_hasher.rounds, extra={'event': 'auth.rehash', 'user': email})
+    except Exception as e:
+        log.warning("Password rehash failed: %s", e, extra={'user': email})
+
+# ============================================================================
+# CHECKOUT
+# ============================================================================
+
+# An order needs two writes per cart line (stock decrement + cart delete)
+# plus the order put and the user update, within one transaction.
+MAX_CHECKOUT_LINES = (MAX_TRANSACT_ITEMS - 2) // 2
+
+class CheckoutError(Exception):
+    """Raised when an order cannot be placed; the message is safe to show users"""
+
+def place_order(user_email, cart_items, delivery_address, phone, payment_method, token):
+    """Place an order atomically.
+
+    Every product's stock is decremented only if enough is left, the order is
+    written, the user's order totals are bumped and the cart rows are deleted,
+    all or nothing. ``token`` doubles as the order id, so a retried submit
+    never creates a second order.
+    """
+    if not cart_items:
+        # A resubmitted form finds the cart already cleared by its first submit
+        existing = get_order(token)
+        if existing and existing.get('user_email') == user_email:
+            return existing
+        raise CheckoutError("Your cart is empty!")
+    if len(cart_items) > MAX_CHECKOUT_LINES:
+        raise CheckoutError(f"Orders are limited to {MAX_CHECKOUT_LINES} different products.")
+
+    # Cart rows keep the price from when the item was first added; the
+    # order is priced from the products as they are now, and the stock
+    # transaction fails if a price moves again before it commits
+    products = repos.products.get_many([item['product_id'] for item in cart_items])
+    order_items = []
+    for item in cart_items:
+        product = products.get(str(item['product_id']))
+        if not product or not product.get('active', True):
+            raise CheckoutError(f"Sorry, {item['name']} is no longer available.")
+        order_items.append({
+            'product_id': str(item['product_id']),
+            'name': product['name'],
+            'price': Decimal(str(product['price'])),
+            'unit': product.get('unit', ''),
+            'quantity': int(item['quantity']),
+            'image': product.get('image', '')
+        })
+    total = sum(i['price'] * i['quantity'] for i in order_items)
+    now = datetime.now()
+    order = {
+        'order_id': token,
+        'user_email': user_email,
+        'items': order_items,
+        'total_amount': total,
+        'delivery_address': delivery_address,
+        'phone': phone,
+        'payment_method': payment_method,
+        'status': 'pending',
+        'order_date': now.strftime("%Y-%m-%d %H:%M:%S"),
+        'created_at': now.isoformat()
+    }
+
+    try:
+        repos.orders.place(order)
+    except OutOfStockError as e:
+        raise CheckoutError(f"Sorry, there isn't enough {e.item['name']} in stock.")
+    except PriceChangedError as e:
+        raise CheckoutError(f"The price of {e.item['name']} just changed, please check your cart and try again.")
+    except DuplicateOrderError:
+        # The order was already placed by an earlier submit of this form
+        return get_order(token)
+
+    catalog_cache.bump_version()
+    cart_summaries.invalidate(user_email)
+    return order
+
+ORDERS_PAGE_SIZE = 10
+RECENT_ORDERS_LIMIT = 5
+
+def encode_cursor(last_key):
+    """Turn a LastEvaluatedKey into an opaque, URL-safe cursor string"""
+    if not last_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_key, sort_keys=True).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        last_key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        return None
+    return last_key if isinstance(last_key, dict) else None
+
+def get_user_orders_page(user_email, limit=ORDERS_PAGE_SIZE, cursor=None):
+    """One page of a user's orders, newest first.
+
+    Returns ``(orders, next_cursor)``; ``next_cursor`` is None on the last
+    page. Each page is a single indexed read with a limit, so its cost does
+    not depend on how many orders the user has placed.
+    """
+    start_key = decode_cursor(cursor)
+    # Never let a tampered cursor page through someone else's orders
+    if not start_key or start_key.get('user_email') != user_email:
+        start_key = None
+    try:
+        orders, last_key = repos.orders.page_for_user(user_email, limit, start_key)
+    except Exception as e:
+        log.error("Error getting orders: %s", e)
+        return [], None
+    return orders, encode_cursor(last_key)
+
+def get_recent_orders(user_email, limit=RECENT_ORDERS_LIMIT):
+    orders, _ = get_user_orders_page(user_email, limit=limit)
+    return orders
+
+def get_order(order_id):
+    try:
+        return repos.orders.get(order_id)
+    except Exception as e:
+        log.error("Error getting order %s: %s", order_id, e)
+        return None
+
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
+
+# Token buckets per route and per client IP / account (see rate_limit.py),
+# checked before the view runs, so a flood of logins never reaches bcrypt.
+# Behind a proxy, set TRUSTED_PROXIES, or every client shares the proxy's IP.
+# RATE_LIMITS overrides the defaults ('<endpoint>:<ip|account>=<n>/<period>,...';
+# empty turns limiting off). RATE_LIMIT_BACKEND=sqlite shares the buckets
+# between every worker on the host through RATE_LIMIT_DB_PATH.
+DEFAULT_RATE_LIMITS = ('login:ip=30/min,login:account=10/min,register:ip=5/min,'
+                       'add_to_cart:ip=120/min,add_to_cart_batch:ip=30/min,'
+                       'contact:ip=5/min,contact:account=5/min')
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+if RATE_LIMIT_BACKEND == 'sqlite':
+    rate_limit_store = SqliteBucketStore(os.getenv('RATE_LIMIT_DB_PATH', os.path.join(app.root_path, 'rate_limits.db')))
+else:
+    rate_limit_store = MemoryBucketStore()
+rate_limiter = RateLimiter(rate_limit_store, parse_limits(os.getenv('RATE_LIMITS', DEFAULT_RATE_LIMITS)),
+                           on_throttle=metrics.record_throttle)
+# Form posts get their page back with a flash; JSON endpoints get JSON
+THROTTLED_TEMPLATES = {'login': 'login.html', 'register': 'register.html', 'contact': 'contact.html'}
+
+def rate_limit_identities():
+    """The IP and, when known, the account a request is charged to"""
+    account = session.get('user_email') or request.form.get('email', '').strip().lower()
+    return {'ip': request.remote_addr, 'account': account}
+
+def rate_limited(retry_after):
+    """429 for a request turned away by a rate limit"""
+    retry_after = max(1, math.ceil(retry_after))
+    message = f"Too many requests. Please wait {retry_after}s and try again."
+    log.warning("Rate limited %s", request.endpoint,
+                extra={'event': 'rate_limit.throttled', 'endpoint': request.endpoint, 'retry_after': retry_after})
+    template = THROTTLED_TEMPLATES.get(request.endpoint)
+    if template:
+        flash(message, "danger")
+        response = make_response(render_template(template, is_logged_in=is_logged_in()), 429)
+    else:
+        response = make_response(jsonify({'success': False, 'message': message}), 429)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+rate_limiter.init_app(app, rate_limit_identities, rate_limited)
+
 # ============================================================================
 # ROUTES
 # ============================================================================
 
 @app.route('/')
+@catalog_page
 def index():
     init_cart()
     products = get_all_products()[:8]
     return render_template('index.html', products=products, is_logged_in=is_logged_in())
 
 @app.route('/products')
+@catalog_page
 def products():
     init_cart()
     category = request.args.get('category', 'all')
-    all_products = get_all_products()
+    if stream_catalog():
+        if category == 'all':
+            filtered_products = catalog_cache.iter_products()
+        else:
+            category_key = category.lower()
+            filtered_products = catalog_cache.iter_products(
+                key=f'category:{category_key}', loader=lambda: _query_category_products(category_key))
+        return stream_page('products.html', products=filtered_products, category=category, is_logged_in=is_logged_in())
     if category == 'all':
-        filtered_products = all_products
+        filtered_products = get_all_products()
     else:
-        filtered_products = [p for p in all_products if p.get('category', '').lower() == category.lower()]
+        filtered_products = get_products_by_category(category)
     return render_template('products.html', products=filtered_products, category=category, is_logged_in=is_logged_in())
 
 @app.route('/product/<int:product_id>')
+@catalog_page
 def product_detail(product_id):
     init_cart()
     product = get_product_by_id(product_id)
@@ -377,8 +1131,7 @@ def register():
         password = request.form['password']
         confirm_password = request.form['confirm_password']
         
-        print(f"\n🔍 Registration attempt for: {email}")
-        print(f"📝 Using table: {users_table.table_name}")
+        log.debug("Registration attempt", extra={'user': email})
         
         if password != confirm_password:
             flash("Passwords don't match!", "danger")
@@ -386,16 +1139,21 @@ def register():
         
         # Check if user exists
         try:
-            response = users_table.get_item(Key={'email': email})
-            if 'Item' in response:
-                print(f"⚠️  User {email} already exists")
+            if repos.users.get(email):
+                log.info("Registration for existing user", extra={'event': 'auth.register_exists', 'user': email})
                 flash("User already exists! Please login.", "info")
                 return redirect(url_for('login'))
         except Exception as e:
-            print(f"⚠️  Error checking existing user: {e}")
+            log.warning("Error checking existing user: %s", e, extra={'user': email})
         
         # Hash password
-        hashed = hashpw(password.encode('utf-8'), gensalt()).decode('utf-8')
+        started = time.perf_counter()
+        try:
+            hashed = password_hasher.hash(password)
+        except HasherBusy:
+            metrics.record_auth('register', 'busy', time.perf_counter() - started)
+            return auth_busy('register.html')
+        metrics.record_auth('register', 'success', time.perf_counter() - started)
         
         # Create user data
         user_data = {
@@ -410,18 +1168,15 @@ def register():
             'total_spent': 0
         }
         
-        # Save to DynamoDB
+        # Save to the users store
         try:
-            print(f"💾 Saving user to {users_table.table_name}...")
-            users_table.put_item(Item=user_data)
-            print(f"✅ User {email} registered successfully!")
+            repos.users.put(user_data)
+            log.info("User registered", extra={'event': 'auth.register', 'user': email})
             
             flash("Registration successful! Please login.", "success")
             return redirect(url_for('login'))
         except Exception as e:
-            print(f"❌ Registration error: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Registration error")
             flash(f"Registration failed: {str(e)}", "danger")
             return redirect(url_for('register'))
     
@@ -433,38 +1188,53 @@ def login():
         email = request.form['email']
         password = request.form['password']
         
-        print(f"\n🔍 Login attempt for: {email}")
-        print(f"📝 Using table: {users_table.table_name}")
+        log.debug("Login attempt", extra={'user': email})
         
+        started = time.perf_counter()
         try:
-            response = users_table.get_item(Key={'email': email})
-            user = response.get('Item')
+            user = repos.users.get(email)
             
             if not user:
-                print(f"❌ User {email} not found")
+                log.info("Login for unknown user", extra={'event': 'auth.unknown_user', 'user': email})
+                metrics.record_auth('login', 'unknown_user', time.perf_counter() - started)
                 flash("User not found! Please register first.", "danger")
                 return redirect(url_for('login'))
             
-            print(f"✅ User {email} found in database")
-            
-            if not checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
-                print(f"❌ Invalid password for {email}")
+            if not password_hasher.verify(password, user['password']):
+                log.info("Login with invalid password", extra={'event': 'auth.bad_password', 'user': email})
+                metrics.record_auth('login', 'bad_password', time.perf_counter() - started)
                 flash("Invalid password!", "danger")
                 return redirect(url_for('login'))
+            metrics.record_auth('login', 'success', time.perf_counter() - started)
+            
+            if password_hasher.needs_rehash(user['password']):
+                upgrade_password_hash(email, password)
             
-            # Login successful
+            # Login successful; carry the guest cart over, and drop it from
+            # the session only once it is stored
+            try:
+                merged = merge_guest_cart(email, session.get('cart', []))
+                session.pop('cart', None)
+                if merged:
+                    log.info("Merged %d guest cart items", merged, extra={'event': 'cart.merge', 'user': email})
+            except Exception as e:
+                log.warning("Guest cart merge failed: %s", e, extra={'user': email})
+            regenerate = getattr(session, 'regenerate', None)
+            if regenerate:
+                regenerate()
             session['user_email'] = email
             session['user_name'] = user['name']
             session['user_type'] = user.get('user_type', 'customer')
             
-            print(f"✅ Login successful for {email}")
+            log.info("Login successful", extra={'event': 'auth.login', 'user': email})
             flash(f"Welcome back, {user['name']}!", "success")
             return redirect(url_for('index'))
             
+        except HasherBusy:
+            metrics.record_auth('login', 'busy', time.perf_counter() - started)
+            return auth_busy('login.html')
         except Exception as e:
-            print(f"❌ Login error: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Login error")
             flash(f"Login failed: {str(e)}", "danger")
             return redirect(url_for('login'))
     
@@ -480,64 +1250,154 @@ def logout():
 @app.route('/cart')
 def cart():
     init_cart()
-    cart_items = get_user_cart(session['user_email']) if is_logged_in() else session.get('cart', [])
+    cart_items = get_user_cart(session['user_email']) if is_logged_in() else hydrate_session_cart(session.get('cart', []))
     total = sum(float(item.get('price', 0)) * int(item.get('quantity', 0)) for item in cart_items)
     return render_template('cart.html', cart_items=cart_items, total=total, is_logged_in=is_logged_in())
 
+@app.route('/api/cart/summary')
+def cart_summary():
+    """Item count and subtotal for the cart badge, with ETag revalidation"""
+    if is_logged_in():
+        user_email = session['user_email']
+        try:
+            summary = cart_summaries.get(user_email, lambda: summarize_cart(load_user_cart(user_email)))
+        except Exception as e:
+            # An empty cart here would be wrong, and cached; let the badge keep its count
+            log.error("Error getting cart summary: %s", e)
+            return jsonify({'success': False, 'message': 'Cart is unavailable right now'}), 503
+    else:
+        summary = summarize_cart(hydrate_session_cart(session.get('cart', [])))
+    response = jsonify(summary)
+    response.set_etag(hashlib.sha1(json.dumps(summary, sort_keys=True).encode('utf-8')).hexdigest()[:16])
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/search')
+def search():
+    """Ranked product matches for the search box, with prefix and typo matching"""
+    query = request.args.get('q', '').strip()[:100]
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), SEARCH_MAX_RESULTS)
+    except ValueError:
+        limit = 10
+    get_all_products()  # fills or refreshes the index if the catalog is stale
+    started = time.perf_counter()
+    results = search_index.search(query, limit=limit)
+    return jsonify({
+        'query': query,
+        'results': results,
+        'took_ms': round((time.perf_counter() - started) * 1000, 3)
+    })
+
 @app.route('/add_to_cart', methods=['POST'])
 def add_to_cart():
     init_cart()
     data = request.json
     product_id = str(data.get('product_id'))
-    quantity = int(data.get('quantity', 1))
+    quantity = parse_cart_quantity(data.get('quantity'))
+    if quantity is None:
+        return jsonify({'success': False, 'message': 'Invalid quantity'})
     product = get_product_by_id(product_id)
     
     if not product:
         return jsonify({'success': False, 'message': 'Product not found'})
     
     if is_logged_in():
-        user_email = session['user_email']
         try:
-            response = cart_table.get_item(Key={'user_email': user_email, 'product_id': product_id})
-            if 'Item' in response:
-                cart_table.update_item(
-                    Key={'user_email': user_email, 'product_id': product_id},
-                    UpdateExpression="SET quantity = quantity + :qty",
-                    ExpressionAttributeValues={':qty': quantity}
-                )
-            else:
-                cart_table.put_item(Item={
-                    'user_email': user_email,
-                    'product_id': product_id,
-                    'name': product['name'],
-                    'price': product['price'],
-                    'unit': product['unit'],
-                    'quantity': quantity,
-                    'image': product['image'],
-                    'added_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
+            add_to_user_cart(session['user_email'], product, quantity)
+            log.info("Added to cart", extra={'event': 'cart.add', 'product_id': product_id, 'quantity': quantity})
             return jsonify({'success': True})
         except Exception as e:
-            print(f"❌ Add to cart error: {e}")
+            log.exception("Add to cart error")
             return jsonify({'success': False, 'message': str(e)})
     else:
         cart = session.get('cart', [])
-        existing = next((i for i in cart if i['id'] == int(product_id)), None)
-        if existing:
-            existing['quantity'] += quantity
-        else:
-            cart.append({
-                'id': int(product_id),
-                'name': product['name'],
-                'price': product['price'],
-                'unit': product['unit'],
-                'quantity': quantity,
-                'image': product['image']
-            })
+        add_to_session_cart(cart, product, quantity)
         session['cart'] = cart
         session.modified = True
         return jsonify({'success': True})
 
+@app.route('/add_to_cart_batch', methods=['POST'])
+def add_to_cart_batch():
+    """Add several products at once: ``{"items": [{"product_id", "quantity"}, ...]}``"""
+    init_cart()
+    data = request.json or {}
+    entries = data.get('items', []) if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        return jsonify({'success': False, 'message': 'Invalid cart items'}), 400
+    quantities = {}
+    for entry in entries:
+        quantity = parse_cart_quantity(entry.get('quantity'))
+        if quantity is None:
+            return jsonify({'success': False, 'message': 'Invalid quantity'})
+        product_id = str(entry.get('product_id'))
+        # One transaction can't touch the same cart row twice, so merge repeats
+        quantities[product_id] = min(quantities.get(product_id, 0) + quantity, MAX_CART_QUANTITY)
+    if not quantities:
+        return jsonify({'success': False, 'message': 'No items given'})
+    if len(quantities) > MAX_TRANSACT_ITEMS:
+        return jsonify({'success': False, 'message': f'At most {MAX_TRANSACT_ITEMS} products per request'})
+
+    lines = []
+    for product_id, quantity in quantities.items():
+        product = get_product_by_id(product_id)
+        if not product:
+            return jsonify({'success': False, 'message': f'Product {product_id} not found'})
+        lines.append((product, quantity))
+
+    if is_logged_in():
+        try:
+            add_many_to_user_cart(session['user_email'], lines)
+        except Exception as e:
+            log.exception("Add to cart error")
+            return jsonify({'success': False, 'message': str(e)})
+    else:
+        cart = session.get('cart', [])
+        for product, quantity in lines:
+            add_to_session_cart(cart, product, quantity)
+        session['cart'] = cart
+        session.modified = True
+    return jsonify({'success': True, 'added': len(lines)})
+
+@app.route('/update_cart', methods=['POST'])
+def update_cart():
+    """Set cart quantities: ``{"items": [{"product_id", "quantity"}, ...]}`` or a
+    single ``{"product_id", "quantity"}``. A quantity of 0 removes the line."""
+    init_cart()
+    data = request.json or {}
+    entries = data.get('items') if isinstance(data, dict) and 'items' in data else [data]
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        return jsonify({'success': False, 'message': 'Invalid cart items'}), 400
+    quantities = {}
+    for entry in entries:
+        quantity = parse_cart_quantity(entry.get('quantity'), allow_zero=True)
+        if quantity is None:
+            return jsonify({'success': False, 'message': 'Invalid quantity'})
+        # Later entries for the same product win
+        quantities[str(entry.get('product_id'))] = quantity
+    if not quantities:
+        return jsonify({'success': False, 'message': 'No items given'})
+    if len(quantities) > MAX_TRANSACT_ITEMS:
+        return jsonify({'success': False, 'message': f'At most {MAX_TRANSACT_ITEMS} products per request'})
+
+    changes = []
+    for product_id, quantity in quantities.items():
+        product = get_product_by_id(product_id) if quantity else None
+        if quantity and not product:
+            return jsonify({'success': False, 'message': f'Product {product_id} not found'})
+        changes.append((product_id, product, quantity))
+
+    if is_logged_in():
+        try:
+            set_user_cart_quantities(session['user_email'], changes)
+        except Exception as e:
+            log.exception("Update cart error")
+            return jsonify({'success': False, 'message': str(e)})
+    else:
+        session['cart'] = set_session_cart_quantities(session.get('cart', []), changes)
+        session.modified = True
+    return jsonify({'success': True, 'updated': len(changes)})
+
 @app.route('/remove_from_cart', methods=['POST'])
 def remove_from_cart():
     data = request.json
@@ -545,10 +1405,10 @@ def remove_from_cart():
     
     if is_logged_in():
         try:
-            cart_table.delete_item(Key={'user_email': session['user_email'], 'product_id': product_id})
+            remove_from_user_cart(session['user_email'], product_id)
             return jsonify({'success': True})
         except Exception as e:
-            print(f"❌ Remove from cart error: {e}")
+            log.exception("Remove from cart error")
             return jsonify({'success': False, 'message': str(e)})
     else:
         cart = [i for i in session.get('cart', []) if i['id'] != int(product_id)]
@@ -556,9 +1416,68 @@ def remove_from_cart():
         session.modified = True
         return jsonify({'success': True})
 
+@app.route('/checkout', methods=['GET', 'POST'])
+def checkout():
+    if not is_logged_in():
+        flash("Please login first!", "info")
+        return redirect(url_for('login'))
+
+    user_email = session['user_email']
+    if request.method == 'POST':
+        token = request.form.get('checkout_token', '')
+        try:
+            token = str(uuid.UUID(token))
+        except ValueError:
+            flash("Your checkout session expired, please try again.", "danger")
+            return redirect(url_for('checkout'))
+        payment_method = request.form.get('payment_method', 'cod')
+        if payment_method not in ('cod', 'online'):
+            payment_method = 'cod'
+        try:
+            order = place_order(
+                user_email,
+                get_user_cart(user_email),
+                request.form['delivery_address'],
+                request.form['phone'],
+                payment_method,
+                token
+            )
+        except CheckoutError as e:
+            flash(str(e), "danger")
+            return redirect(url_for('cart'))
+        except Exception as e:
+            log.exception("Checkout error")
+            flash(f"Error placing order: {str(e)}", "danger")
+            return redirect(url_for('checkout'))
+        log.info("Order placed", extra={'event': 'order.placed', 'order_id': order['order_id'], 'user': user_email})
+        flash("Order placed successfully!", "success")
+        return redirect(url_for('order_confirmation', order_id=order['order_id']))
+
+    cart_items, user = run_concurrently((get_user_cart, user_email), (get_user_profile, user_email))
+    if not cart_items:
+        flash("Your cart is empty!", "info")
+        return redirect(url_for('cart'))
+    total = sum(float(item.get('price', 0)) * int(item.get('quantity', 0)) for item in cart_items)
+    return render_template('checkout.html', user=user, cart_items=cart_items, total=total,
+                           checkout_token=str(uuid.uuid4()), is_logged_in=is_logged_in())
+
+@app.route('/order/<order_id>')
+def order_confirmation(order_id):
+    if not is_logged_in():
+        flash("Please login first!", "info")
+        return redirect(url_for('login'))
+    order = get_order(order_id)
+    if not order or order.get('user_email') != session['user_email']:
+        flash("Order not found!", "danger")
+        return redirect(url_for('my_orders'))
+    return render_template('order_confirmation.html', order=order, is_logged_in=is_logged_in())
+
 @app.route('/ai_assistant')
+@catalog_page
 def ai_assistant():
     init_cart()
+    if stream_catalog():
+        return stream_page('ai_assistant.html', products=catalog_cache.iter_products(), is_logged_in=is_logged_in())
     products = get_all_products()
     return render_template('ai_assistant.html', products=products, is_logged_in=is_logged_in())
 
@@ -569,28 +1488,20 @@ def generate_recipe():
     if not ingredients:
         return jsonify({'success': False, 'message': 'Please select ingredients'})
     
-    recipe = {
-        'name': f'🥗 {" & ".join(ingredients)} Recipe',
-        'time': '20 min',
-        'difficulty': 'Easy',
-        'servings': '3-4',
-        'ingredients_list': [f'{i} - 200g' for i in ingredients],
-        'instructions': [
-            'Wash all ingredients thoroughly',
-            'Chop into desired pieces',
-            'Cook or mix as needed',
-            'Season to taste',
-            'Serve hot or cold'
-        ],
-        'tips': 'Fresh ingredients make the best dishes!'
-    }
-    return jsonify({'success': True, 'recipe': recipe})
+    get_all_products()  # refreshes the product links if the catalog is stale
+    suggestions = recipe_book.suggest(ingredients, limit=RECIPE_SUGGESTIONS)
+    if not suggestions:
+        return jsonify({'success': False, 'message': "We don't have a recipe for those ingredients yet. Try adding a few more!"})
+    for suggestion in suggestions:
+        for product in suggestion['products']:
+            product['url'] = url_for('product_detail', product_id=int(product['product_id']))
+    return jsonify({'success': True, 'recipe': suggestions[0], 'alternatives': suggestions[1:]})
 
 @app.route('/contact', methods=['GET', 'POST'])
 def contact():
     if request.method == 'POST':
         try:
-            contact_messages_table.put_item(Item={
+            message = {
                 'message_id': str(uuid.uuid4()),
                 'name': request.form['name'],
                 'email': request.form['email'],
@@ -598,11 +1509,15 @@ def contact():
                 'message': request.form['message'],
                 'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 'status': 'new'
-            })
-            print(f"✅ Contact message saved from {request.form['email']}")
+            }
+            try:
+                write_behind.enqueue('contact', message)
+            except SpoolFull:
+                repos.contacts.add(message)
+            log.info("Contact message saved", extra={'event': 'contact.saved'})
             flash("Message sent successfully! We'll get back to you soon.", "success")
         except Exception as e:
-            print(f"❌ Contact message error: {e}")
+            log.exception("Contact message error")
             flash(f"Error sending message: {str(e)}", "danger")
         return redirect(url_for('contact'))
     return render_template('contact.html', is_logged_in=is_logged_in())
@@ -614,11 +1529,12 @@ def profile():
         return redirect(url_for('login'))
     
     try:
-        response = users_table.get_item(Key={'email': session['user_email']})
-        user = response.get('Item', {})
-        return render_template('profile.html', user=user, recent_orders=[], is_logged_in=is_logged_in())
+        user, recent_orders = run_concurrently((repos.users.get, session['user_email']),
+                                               (get_recent_orders, session['user_email']))
+        user = user or {}
+        return render_template('profile.html', user=user, recent_orders=recent_orders, is_logged_in=is_logged_in())
     except Exception as e:
-        print(f"❌ Profile error: {e}")
+        log.exception("Profile error")
         flash(f"Error loading profile: {str(e)}", "danger")
         return redirect(url_for('index'))
 
@@ -634,18 +1550,13 @@ def update_profile():
         phone = request.form.get('phone')
         address = request.form.get('address')
         
-        users_table.update_item(
-            Key={'email': user_email},
-            UpdateExpression="SET #n = :name, phone = :phone, address = :address",
-            ExpressionAttributeNames={'#n': 'name'},
-            ExpressionAttributeValues={':name': name, ':phone': phone, ':address': address}
-        )
+        repos.users.update_profile(user_email, name, phone, address)
         
         session['user_name'] = name
-        print(f"✅ Profile updated for {user_email}")
+        log.info("Profile updated", extra={'event': 'profile.updated', 'user': user_email})
         flash("Profile updated successfully!", "success")
     except Exception as e:
-        print(f"❌ Profile update error: {e}")
+        log.exception("Profile update error")
         flash(f"Error updating profile: {str(e)}", "danger")
     
     return redirect(url_for('profile'))
@@ -655,7 +1566,8 @@ def my_orders():
     if not is_logged_in():
         flash("Please login first!", "info")
         return redirect(url_for('login'))
-    return render_template('my_orders.html', orders=[], is_logged_in=is_logged_in())
+    orders, next_cursor = get_user_orders_page(session['user_email'], cursor=request.args.get('cursor'))
+    return render_template('my_orders.html', orders=orders, next_cursor=next_cursor, is_logged_in=is_logged_in())
 
 @app.route('/admin')
 def admin_dashboard():
@@ -664,6 +1576,27 @@ def admin_dashboard():
         return redirect(url_for('index'))
     return render_template('admin_dashboard.html', is_logged_in=is_logged_in())
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    catalog = catalog_cache.stats()
+    carts = cart_summaries.stats()
+    hasher = password_hasher.stats()
+    body = metrics.render({
+        'freshbasket_catalog_cache_hits': catalog['hits'],
+        'freshbasket_catalog_cache_misses': catalog['misses'],
+        'freshbasket_catalog_cache_version': catalog['version'],
+        'freshbasket_cart_summary_hits': carts['hits'],
+        'freshbasket_cart_summary_misses': carts['misses'],
+        'freshbasket_password_hash_in_flight': hasher['in_flight'],
+        'freshbasket_password_hash_rejected': hasher['rejected'],
+        'freshbasket_log_records_dropped': app_logging.dropped_records(),
+        'freshbasket_write_behind_pending': write_behind.pending,
+        'freshbasket_write_behind_dead': write_behind.dead,
+        'freshbasket_rate_limit_buckets': len(rate_limit_store)
+    })
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 # ============================================================================
 # DEBUG ROUTES (Remove in production)
 # ============================================================================
@@ -672,19 +1605,7 @@ def admin_dashboard():
 def debug_tables():
     """Debug route to check table configuration"""
     try:
-        all_tables = dynamodb_client.list_tables()['TableNames']
-        info = {
-            'all_tables_in_aws': all_tables,
-            'app_table_references': {
-                'users': users_table.table_name,
-                'products': products_table.table_name,
-                'cart': cart_table.table_name,
-                'orders': orders_table.table_name,
-                'contact': contact_messages_table.table_name
-            },
-            'region': os.getenv('AWS_REGION', 'ap-south-1')
-        }
-        return jsonify(info)
+        return jsonify(repos.describe())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -692,29 +1613,36 @@ def debug_tables():
 def debug_users():
     """Debug route to see all users"""
     try:
-        response = users_table.scan()
-        users = response.get('Items', [])
+        users = repos.users.list_all()
         # Remove passwords from output
         for user in users:
             user.pop('password', None)
         return jsonify({
             'count': len(users),
             'users': users,
-            'table_name': users_table.table_name
+            'backend': STORAGE_BACKEND
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/debug/cache')
+def debug_cache():
+    """Debug route to see catalog cache counters"""
+    return jsonify({'catalog': catalog_cache.stats(), 'cart_summaries': cart_summaries.stats(),
+                    'password_hasher': password_hasher.stats(), 'search_index': search_index.stats(),
+                    'recipes': recipe_book.stats(), 'pages': page_cache.stats(),
+                    'assets': assets.stats(), 'images': image_store.stats() if image_store else {'enabled': False},
+                    'rate_limits': rate_limiter.stats(), 'compression': compressor.stats()})
+
 @app.route('/debug/products')
 def debug_products():
     """Debug route to see all products"""
     try:
-        response = products_table.scan()
-        products = response.get('Items', [])
+        products = repos.products.list_all()
         return jsonify({
             'count': len(products),
             'products': products[:5],  # First 5 only
-            'table_name': products_table.table_name
+            'backend': STORAGE_BACKEND
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -729,24 +1657,58 @@ def page_not_found(e):
 
 @app.errorhandler(500)
 def server_error(e):
-    print(f"❌ Server error: {e}")
+    log.error("Server error: %s", e)
     return render_template('500.html', is_logged_in=is_logged_in()), 500
 
+# ============================================================================
+# APP FACTORY
+# ============================================================================
+
+def warm_up():
+    """Open storage connections, start the hash workers and fill the catalog
+    cache ahead of traffic"""
+    started = time.monotonic()
+    try:
+        repos.warm_up()
+        password_hasher.warm_up()
+        products = get_all_products()
+        log.info("Warm-up loaded %d products in %.2fs", len(products), time.monotonic() - started)
+    except Exception as e:
+        log.warning("Warm-up failed: %s", e)
+
+def create_app(warm=None):
+    """Entry point for WSGI servers (e.g. ``gunicorn 'app:create_app()'``).
+
+    Schema bootstrap is not done here; run ``flask --app app init-db`` once.
+    The memory backend is the exception: it lives and dies with this process,
+    so it is seeded here. With ``warm`` (default: the WARM_UP env var, on unless "0") the catalog
+    cache is filled on a background thread so the first request is fast.
+    Background workers (the write-behind flusher) start here rather than on
+    import, so CLI commands and other importers never run them; servers that
+    use the module-level ``app`` start the flusher on the first enqueue.
+    """
+    if repos.backend == 'memory':
+        init_db()
+    write_behind.start()
+    if warm is None:
+        warm = os.getenv('WARM_UP', '1') != '0'
+    if warm:
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+    return app
+
 # ============================================================================
 # RUN APPLICATION
 # ============================================================================
 
 if __name__ == '__main__':
-    print("\n" + "="*70)
-    print("🚀 FreshBasket - Fresh Fruits & Vegetables Store")
-    print("="*70)
-    print("✨ Running with AWS DynamoDB")
-    print("💾 Data persisted in AWS Cloud")
-    print("📍 http://127.0.0.1:5000")
-    print("\n🔍 Debug routes available:")
-    print("   - http://127.0.0.1:5000/debug/tables")
-    print("   - http://127.0.0.1:5000/debug/users")
-    print("   - http://127.0.0.1:5000/debug/products")
-    print("="*70 + "\n")
+    log.info("FreshBasket starting on http://127.0.0.1:5000 with %s storage", STORAGE_BACKEND)
+    log.info("Debug routes: /debug/tables /debug/users /debug/products /debug/cache")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # The reloader re-runs this file in a child process (WERKZEUG_RUN_MAIN)
+    # that serves; this one only watches files. Bootstrap once here, and
+    # create the app (seeding the memory backend, background workers,
+    # warm-up) only in the child.
+    serving = os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    if not serving and repos.backend != 'memory':
+        init_db()
+    (create_app() if serving else app).run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,40 @@
+"""ASGI entry point.
+
+    pip install uvicorn
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+The ASGI server owns the connections on its event loop, so idle keep-alive
+connections cost no thread. Each request runs the WSGI app on a thread of
+its own (asgiref would otherwise run every request on one shared thread, one
+at a time). At most ASGI_THREADS requests run at once per worker; the rest
+wait on the event loop without holding a thread. IO_THREADS caps the storage
+calls those requests fan out to, and views such as /checkout and /profile
+issue their independent reads concurrently.
+"""
+
+import asyncio
+import os
+
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', '32'))
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """``WsgiToAsgi`` running each request in its own thread-sensitive
+    context, so requests no longer queue behind each other"""
+
+    def __init__(self, wsgi_application, max_threads=ASGI_THREADS):
+        super().__init__(wsgi_application)
+        self._threads = asyncio.Semaphore(max_threads)
+
+    async def __call__(self, scope, receive, send):
+        async with self._threads:
+            async with ThreadSensitiveContext():
+                await super().__call__(scope, receive, send)
+
+
+application = ThreadedWsgiToAsgi(create_app())
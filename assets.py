@@ -0,0 +1,202 @@
+"""Fingerprinted, precompressed static assets.
+
+``flask --app app build-assets`` (run at deploy time) minifies style.css and
+main.js and writes them to static/dist under names carrying a hash of their
+content (``style.3f2a9c1b7e.css``), next to ``.gz`` and, when the brotli
+package is installed, ``.br`` copies a front proxy can serve as they are.
+
+At startup the app only loads that build. ``url_for('static',
+filename='style.css')`` then resolves to the hashed name, so templates need
+no changes, and hashed files are served from memory in the smallest encoding
+the client accepts with a one-year immutable Cache-Control: an edited file
+gets a new name, so browsers never revalidate. Files with no build, or edited
+since the last one, are served unbundled.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+log = logging.getLogger('freshbasket.assets')
+
+ASSET_FILES = ('style.css', 'main.js')
+MIMETYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+MAX_AGE = 365 * 24 * 3600
+# Older builds stay on disk this long for pages that still reference them
+KEEP_OLD_BUILDS_SECONDS = 7 * 24 * 3600
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE_AROUND = re.compile(r'\s*([{};,])\s*')
+
+
+def minify_css(text):
+    text = _CSS_COMMENT.sub('', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = _CSS_SPACE_AROUND.sub(r'\1', text)
+    # Only after a colon: before one it can be a descendant selector (a :hover)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """Whitespace and whole-line comments only; line breaks are kept so
+    automatic semicolon insertion still sees the same statements"""
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def _write(path, data):
+    if os.path.exists(path):
+        return
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    # Several workers may build at once; each file appears whole or not at all
+    os.replace(tmp, path)
+
+
+class AssetPipeline:
+
+    def __init__(self, static_folder, files=ASSET_FILES, out_dir='dist'):
+        self.static_folder = static_folder
+        self.files = files
+        self.out_dir = out_dir
+        self.manifest = {}  # 'style.css' -> 'dist/style.<hash>.css'
+        self._served = {}  # 'dist/style.<hash>.css' -> (mimetype, etag, {encoding: bytes})
+        self._app = None
+
+    def build(self):
+        """Minify, fingerprint and compress every asset; returns the manifest"""
+        started = time.monotonic()
+        out = os.path.join(self.static_folder, self.out_dir)
+        os.makedirs(out, exist_ok=True)
+        manifest, served = {}, {}
+        for name in self.files:
+            stem, ext = os.path.splitext(name)
+            with open(os.path.join(self.static_folder, name), encoding='utf-8') as f:
+                body = MINIFIERS[ext](f.read()).encode('utf-8')
+            digest = hashlib.sha256(body).hexdigest()[:10]
+            hashed = f'{self.out_dir}/{stem}.{digest}{ext}'
+            variants = {'identity': body, 'gzip': gzip.compress(body, 9, mtime=0)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(body, quality=11)
+            path = os.path.join(self.static_folder, hashed)
+            _write(path, body)
+            _write(path + '.gz', variants['gzip'])
+            if 'br' in variants:
+                _write(path + '.br', variants['br'])
+            manifest[name] = hashed
+            served[hashed] = (MIMETYPES[ext], digest, variants)
+        with open(os.path.join(out, 'manifest.json.tmp'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(os.path.join(out, 'manifest.json.tmp'), os.path.join(out, 'manifest.json'))
+        self._prune(out, served)
+        self.manifest, self._served = manifest, served
+        log.info("Built %d static assets in %.1f ms", len(manifest), 1000 * (time.monotonic() - started),
+                 extra={'event': 'assets.built', 'brotli': brotli is not None})
+        return manifest
+
+    def load(self):
+        """Load the last build from static/dist, leaving out assets whose
+        source has changed since; returns the manifest (empty without a
+        build)"""
+        out = os.path.join(self.static_folder, self.out_dir)
+        manifest, served = {}, {}
+        try:
+            with open(os.path.join(out, 'manifest.json')) as f:
+                built = json.load(f)
+            for name, hashed in built.items():
+                stem, ext = os.path.splitext(name)
+                with open(os.path.join(self.static_folder, name), encoding='utf-8') as f:
+                    digest = hashlib.sha256(MINIFIERS[ext](f.read()).encode('utf-8')).hexdigest()[:10]
+                if hashed != f'{self.out_dir}/{stem}.{digest}{ext}':
+                    log.warning("%s changed since the last asset build; serving it unbundled until "
+                                "`flask --app app build-assets` runs", name)
+                    continue
+                path = os.path.join(self.static_folder, hashed)
+                variants = {}
+                for encoding, suffix in (('identity', ''), ('gzip', '.gz'), ('br', '.br')):
+                    if encoding == 'identity' or os.path.exists(path + suffix):
+                        with open(path + suffix, 'rb') as f:
+                            variants[encoding] = f.read()
+                manifest[name] = hashed
+                served[hashed] = (MIMETYPES[ext], digest, variants)
+        except FileNotFoundError:
+            log.info("No asset build in %s; serving static files unbundled", out)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("Could not load the asset build in %s (%s); serving static files unbundled", out, e)
+            manifest, served = {}, {}
+        self.manifest, self._served = manifest, served
+        return manifest
+
+    def _prune(self, out, served):
+        current = {os.path.basename(hashed) for hashed in served}
+        cutoff = time.time() - KEEP_OLD_BUILDS_SECONDS
+        for entry in os.scandir(out):
+            base = entry.name.removesuffix('.gz').removesuffix('.br')
+            if base in current or entry.name == 'manifest.json':
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Flask integration
+    # ------------------------------------------------------------------
+
+    def init_app(self, app):
+        """Load the last build, resolve static URLs to hashed names and
+        serve those with negotiated encodings"""
+        self._app = app
+        self.load()
+        app.url_defaults(self._fingerprint)
+        app.view_functions['static'] = self._serve
+
+    def _fingerprint(self, endpoint, values):
+        if endpoint == 'static':
+            hashed = self.manifest.get(values.get('filename'))
+            if hashed:
+                values['filename'] = hashed
+
+    def _serve(self, filename):
+        asset = self._served.get(filename)
+        if asset is None:
+            return self._app.send_static_file(filename)
+        mimetype, digest, variants = asset
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in variants and request.accept_encodings.quality(candidate) > 0:
+                encoding = candidate
+                break
+        response = self._app.response_class(variants[encoding], mimetype=mimetype)
+        if encoding != 'identity':
+            response.content_encoding = encoding
+        response.set_etag(digest if encoding == 'identity' else f'{digest}-{encoding}')
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.max_age = MAX_AGE
+        response.cache_control.immutable = True
+        return response.make_conditional(request)
+
+    def stats(self):
+        return {
+            'assets': {name: {'url': hashed, **{enc: len(body) for enc, body in self._served[hashed][2].items()}}
+                       for name, hashed in self.manifest.items()},
+            'brotli': brotli is not None
+        }
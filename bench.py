@@ -0,0 +1,284 @@
+"""Load-test FreshBasket against an in-process DynamoDB stand-in.
+
+The app runs inside this process on Flask's test client while moto's
+``mock_aws`` plays DynamoDB (or, with ``--backend sqlite|memory``, the app
+uses that storage backend instead), so nothing touches AWS and runs are
+repeatable.
+Each virtual user walks a scripted scenario; per-route latency percentiles,
+requests/sec and DynamoDB calls per request are reported and can be saved
+as a JSON baseline and compared against on later runs. ``--compare`` exits
+with 1 on a regression, and with 2 before running if the baseline was
+recorded with other settings.
+
+    pip install -r requirements-bench.txt
+    python bench.py --products 2000 --users 500 --sessions 200 --concurrency 8
+    python bench.py --save-baseline bench_baseline.json
+    python bench.py --compare bench_baseline.json --tolerance 0.25
+    python bench.py --backend memory
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+# The app reads these at import time
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'ap-south-1')
+os.environ.setdefault('AWS_REGION', os.environ['AWS_DEFAULT_REGION'])
+os.environ.setdefault('SESSION_BACKEND', 'memory')
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('IMAGE_CACHE', '0')
+# Every simulated user comes from one address
+os.environ.setdefault('RATE_LIMITS', '')
+
+BENCH_PASSWORD = 'bench-password'
+CATEGORIES = ['Fruits', 'Vegetables']
+RECIPE_INGREDIENTS = ['Fresh Tomatoes', 'Onions', 'Potatoes', 'Fresh Carrots', 'Fresh Spinach', 'Bell Peppers',
+                      'Mushrooms', 'Bananas', 'Strawberries', 'Mangoes', 'Green Apples', 'Cucumbers']
+
+
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def seed(app_module, products, users):
+    """Bootstrap the tables and top the catalog/user base up to the given sizes"""
+    app_module.init_db()
+    extra = []
+    for i in range(len(app_module.PRODUCTS) + 1, products + 1):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        extra.append({
+            'product_id': str(i), 'name': f'Bench {category[:-1]} {i}', 'category': category,
+            'price': 10 + i % 200, 'unit': 'kg', 'description': f'Benchmark product {i}',
+            'image': f'https://example.com/products/{i}.jpg', 'stock': 1000000, 'active': True
+        })
+    app_module.repos.products.put_many(extra)
+
+    # One hash shared by every bench user; hashing per user would dominate setup
+    hashed = app_module.password_hasher.hash(BENCH_PASSWORD)
+    app_module.repos.users.put_many([
+        {
+            'email': f'user{i}@bench.local', 'name': f'Bench User {i}', 'password': hashed,
+            'phone': '', 'address': 'Bench Street', 'user_type': 'customer',
+            'registration_date': '2025-01-01 00:00:00', 'total_orders': 0, 'total_spent': 0
+        } for i in range(users)
+    ])
+
+
+def shopper(client, rng, products, users):
+    """browse -> product detail -> add_to_cart -> cart -> login -> cart"""
+    product_id = rng.randint(1, products)
+    email = f'user{rng.randrange(users)}@bench.local'
+    return [
+        ('GET /', lambda: client.get('/')),
+        ('GET /products', lambda: client.get('/products')),
+        ('GET /products?category', lambda: client.get(f'/products?category={rng.choice(CATEGORIES).lower()}')),
+        ('GET /product/<id>', lambda: client.get(f'/product/{product_id}')),
+        ('POST /add_to_cart', lambda: client.post('/add_to_cart', json={'product_id': product_id, 'quantity': 1})),
+        ('GET /cart', lambda: client.get('/cart')),
+        ('POST /login', lambda: client.post('/login', data={'email': email, 'password': BENCH_PASSWORD})),
+        ('GET /cart', lambda: client.get('/cart')),
+        ('GET /api/cart/summary', lambda: client.get('/api/cart/summary')),
+        ('GET /logout', lambda: client.get('/logout')),
+    ]
+
+
+def browser(client, rng, products, users):
+    """Anonymous catalog browsing only"""
+    return [
+        ('GET /', lambda: client.get('/')),
+        ('GET /products', lambda: client.get('/products')),
+        ('GET /products?category', lambda: client.get(f'/products?category={rng.choice(CATEGORIES).lower()}')),
+        ('GET /product/<id>', lambda: client.get(f'/product/{rng.randint(1, products)}')),
+        ('GET /ai_assistant', lambda: client.get('/ai_assistant')),
+        ('POST /generate_recipe', lambda: client.post(
+            '/generate_recipe', json={'ingredients': rng.sample(RECIPE_INGREDIENTS, rng.randint(1, 4))})),
+    ]
+
+
+SCENARIOS = {'shopper': shopper, 'browser': browser}
+
+
+def run(app_module, scenario, sessions, concurrency, products, users, seed_value):
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    counter = iter(range(sessions))
+    counter_lock = threading.Lock()
+
+    def worker(worker_id):
+        rng = random.Random(seed_value + worker_id)
+        while True:
+            with counter_lock:
+                if next(counter, None) is None:
+                    return
+            client = app_module.app.test_client()
+            for route, call in SCENARIOS[scenario](client, rng, products, users):
+                started = time.perf_counter()
+                response = call()
+                # Streamed pages render while their body is read
+                response.get_data()
+                response.close()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples[route].append(elapsed)
+                    if response.status_code >= 500:
+                        errors[route] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, errors, time.perf_counter() - started
+
+
+def report(samples, errors, wall, db_calls):
+    routes = {}
+    total = 0
+    for route, values in sorted(samples.items()):
+        values.sort()
+        total += len(values)
+        routes[route] = {
+            'requests': len(values),
+            'errors': errors.get(route, 0),
+            'mean_ms': round(1000 * sum(values) / len(values), 3),
+            'p50_ms': round(1000 * percentile(values, 0.50), 3),
+            'p95_ms': round(1000 * percentile(values, 0.95), 3),
+            'p99_ms': round(1000 * percentile(values, 0.99), 3),
+        }
+    return {
+        'total_requests': total,
+        'wall_seconds': round(wall, 3),
+        'requests_per_second': round(total / wall, 1) if wall else 0.0,
+        'routes': routes,
+        'dynamodb_calls_per_request': db_calls,
+    }
+
+
+def dynamodb_calls_per_request(app_module):
+    """Average DynamoDB calls per request, keyed by Flask endpoint"""
+    calls = defaultdict(int)
+    for (endpoint, _operation), count in app_module.metrics.db_calls.items():
+        calls[endpoint] += count
+    per_request = {}
+    for (endpoint, _method), hist in app_module.metrics.requests.items():
+        if hist.count:
+            per_request[endpoint] = round(calls.get(endpoint, 0) / hist.count, 3)
+    return dict(sorted(per_request.items()))
+
+
+def print_report(result):
+    print(f"\n{'route':<26}{'reqs':>7}{'err':>5}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for route, r in result['routes'].items():
+        print(f"{route:<26}{r['requests']:>7}{r['errors']:>5}{r['mean_ms']:>10.2f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+    print(f"\n{result['total_requests']} requests in {result['wall_seconds']}s "
+          f"-> {result['requests_per_second']} req/s")
+    print("\nDynamoDB calls per request:")
+    for endpoint, calls in result['dynamodb_calls_per_request'].items():
+        print(f"   {endpoint:<24}{calls:>8.2f}")
+
+
+def compare(result, baseline, tolerance):
+    """Print per-route p95 changes; return the routes that regressed"""
+    regressions = []
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    for route, r in result['routes'].items():
+        base = baseline.get('routes', {}).get(route)
+        if not base or not base['p95_ms']:
+            continue
+        change = (r['p95_ms'] - base['p95_ms']) / base['p95_ms']
+        flag = 'REGRESSION' if change > tolerance else ''
+        print(f"   {route:<26}{base['p95_ms']:>10.2f} -> {r['p95_ms']:>10.2f} ms p95 ({change:+.0%}) {flag}")
+        if flag:
+            regressions.append(route)
+    base_rps = baseline.get('requests_per_second')
+    if base_rps:
+        change = (result['requests_per_second'] - base_rps) / base_rps
+        print(f"   {'throughput':<26}{base_rps:>10.1f} -> {result['requests_per_second']:>10.1f} req/s ({change:+.0%})")
+        if change < -tolerance:
+            regressions.append('throughput')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='shopper')
+    parser.add_argument('--backend', choices=['dynamodb', 'sqlite', 'memory'], default='dynamodb',
+                        help='storage backend the app runs against')
+    parser.add_argument('--products', type=int, default=500, help='catalog size to seed')
+    parser.add_argument('--users', type=int, default=100, help='registered users to seed')
+    parser.add_argument('--sessions', type=int, default=50, help='scenario runs in total')
+    parser.add_argument('--concurrency', type=int, default=4, help='virtual users running at once')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for reproducible runs')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write results to this JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown before failing')
+    args = parser.parse_args(argv)
+    config = {k: v for k, v in vars(args).items() if k not in ('save_baseline', 'compare', 'tolerance')}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # Timings from another configuration say nothing about regressions
+        base_config = baseline.get('config') or {}
+        differences = [f"--{k.replace('_', '-')} {base_config.get(k)} (baseline) vs {config.get(k)}"
+                       for k in sorted(set(base_config) | set(config)) if base_config.get(k) != config.get(k)]
+        if differences:
+            print(f"❌ {args.compare} was recorded with a different configuration:", file=sys.stderr)
+            for difference in differences:
+                print(f"   {difference}", file=sys.stderr)
+            print("   Re-run with the baseline's settings or save a new baseline.", file=sys.stderr)
+            sys.exit(2)
+
+    os.environ['STORAGE_BACKEND'] = args.backend
+    if args.backend == 'dynamodb':
+        try:
+            from moto import mock_aws
+        except ImportError:
+            sys.exit("bench.py needs moto for its local DynamoDB: pip install -r requirements-bench.txt")
+        storage = mock_aws()
+    else:
+        storage = tempfile.TemporaryDirectory()
+        os.environ['SQLITE_DB_PATH'] = os.path.join(storage.name, 'bench.db')
+
+    with storage:
+        import app as app_module
+
+        print(f"🌱 Seeding {args.products} products and {args.users} users...")
+        seed(app_module, args.products, args.users)
+        # Count only what the scenario itself costs
+        app_module.metrics.reset()
+        print(f"🚀 Running {args.sessions} '{args.scenario}' sessions with concurrency {args.concurrency}...")
+        samples, errors, wall = run(app_module, args.scenario, args.sessions, args.concurrency,
+                                    args.products, args.users, args.seed)
+        result = report(samples, errors, wall, dynamodb_calls_per_request(app_module))
+
+    result['config'] = config
+    print_report(result)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    if baseline is not None and compare(result, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""Local product image thumbnails.
+
+Each product's source image is ingested once: downloaded from its ``image``
+URL or, in offline mode, read from a local folder (``<product_id>.jpg`` or
+``green-apples.jpg``). It is then resized to a few widths in WebP and JPEG.
+Files are content-addressed (named by a hash of the source image), so a URL
+never changes meaning and is served with a one-year immutable Cache-Control.
+The cache directory is capped in bytes and evicts the least recently served
+files first. Serving a size also refreshes the product's kept source copy, so
+sizes go before their source; an evicted size is rebuilt from that source in
+the background, and the source itself is sent in the meantime.
+
+Ingestion and rebuilds run on background threads fed by catalog refreshes
+and requests, never on a request thread. Until a product's image is ready,
+pages keep using its source URL. The cache directory is only read once the
+store is first used. Needs Pillow; without it the cache stays off.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import redirect, send_file
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+log = logging.getLogger('freshbasket.images')
+
+MAX_AGE = 365 * 24 * 3600
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+FORMATS = {'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+           'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'progressive': True, 'optimize': True})}
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+# A source that failed to ingest is retried after this long
+RETRY_SECONDS = 600
+
+_VARIANT = re.compile(r'^([0-9a-f]{24})-(\d+)\.(webp|jpg)$')
+# How long a browser may keep a source sent while its size is rebuilt
+REBUILD_MAX_AGE = 60
+
+
+def source_mimetype(head):
+    """The image type of a kept source, from its first bytes"""
+    if head.startswith(b'\x89PNG'):
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', str(name or '').lower()).strip('-')
+
+
+class ImageStore:
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, widths=(160, 320, 500), offline=False,
+                 source_dir=None, fetch_timeout=10, workers=2, url_prefix='/images/'):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.widths = tuple(sorted(widths))
+        self.offline = offline
+        self.source_dir = source_dir
+        self.fetch_timeout = fetch_timeout
+        self.workers = workers
+        self.url_prefix = url_prefix
+        self.enabled = Image is not None
+        self._lock = threading.Lock()
+        self._files = OrderedDict()  # path relative to cache_dir -> bytes, least recently served first
+        self._bytes = 0
+        self._keys = {}  # source URL or path -> content key
+        self._sources = {}  # content key -> source
+        self._products = {}  # product_id -> (source, content key or None)
+        self._urls = {}  # content key -> {'src', 'webp', 'jpeg'} for templates
+        self._pending = set()  # sources being ingested and keys being rebuilt
+        self._failed_at = {}  # source -> monotonic time of the last failed ingest
+        self._pool = None
+        self._loaded = False
+        self.ingested = 0
+        self.rebuilt = 0
+        self.failed = 0
+        self.evicted = 0
+
+    # ------------------------------------------------------------------
+    # On-disk cache
+    # ------------------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name[:2], name)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+
+    def _load(self):
+        # Caller holds the lock
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            with open(os.path.join(self.cache_dir, 'index.json')) as f:
+                self._keys = json.load(f)
+        except (OSError, ValueError):
+            self._keys = {}
+        self._sources = {key: source for source, key in self._keys.items()}
+        found = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name != 'index.json' and not name.endswith('.tmp'):
+                    stat = os.stat(os.path.join(root, name))
+                    found.append((stat.st_mtime, name, stat.st_size))
+        # Last served (or written) last, so eviction survives restarts
+        for _, name, size in sorted(found):
+            self._files[name] = size
+            self._bytes += size
+
+    def _save_index(self):
+        tmp = os.path.join(self.cache_dir, f'index.json.{os.getpid()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self._keys, f)
+        os.replace(tmp, os.path.join(self.cache_dir, 'index.json'))
+
+    def _store(self, name, data):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._bytes += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock
+        while self._bytes > self.max_bytes and len(self._files) > 1:
+            name, size = self._files.popitem(last=False)
+            self._bytes -= size
+            self.evicted += 1
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def _touch(self, name):
+        with self._lock:
+            if name in self._files:
+                self._files.move_to_end(name)
+        path = self._path(name)
+        # Keep mtime roughly in step with use, at most one write an hour
+        try:
+            if time.time() - os.stat(path).st_mtime > 3600:
+                os.utime(path)
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def _local_sources(self):
+        """``{stem: path}`` for the files in the offline source folder"""
+        try:
+            names = os.listdir(self.source_dir)
+        except (OSError, TypeError):
+            return {}
+        return {os.path.splitext(n)[0].lower(): os.path.join(self.source_dir, n)
+                for n in names if n.lower().endswith(SOURCE_EXTENSIONS)}
+
+    def _read_source(self, source):
+        if self.offline:
+            with open(source, 'rb') as f:
+                return f.read(MAX_SOURCE_BYTES + 1)
+        with urllib.request.urlopen(source, timeout=self.fetch_timeout) as response:
+            return response.read(MAX_SOURCE_BYTES + 1)
+
+    def _render(self, key, data):
+        """Write every width and format of ``data`` under ``key``"""
+        with Image.open(io.BytesIO(data)) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+        for width in self.widths:
+            resized = image
+            if image.width > width:
+                resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            for ext, (fmt, _, options) in FORMATS.items():
+                out = io.BytesIO()
+                resized.save(out, fmt, **options)
+                self._store(f'{key}-{width}.{ext}', out.getvalue())
+
+    def _ingest(self, product_id, source):
+        try:
+            data = self._read_source(source)
+            if len(data) > MAX_SOURCE_BYTES:
+                raise ValueError(f"source image is over {MAX_SOURCE_BYTES} bytes")
+            key = hashlib.sha256(data).hexdigest()[:24]
+            self._render(key, data)
+            # Stored after its sizes, so it is not the first to be evicted
+            self._store(f'{key}.src', data)
+            with self._lock:
+                self._keys[source] = key
+                self._sources[key] = source
+                self._products[product_id] = (source, key)
+                self._failed_at.pop(source, None)
+                self._save_index()
+                self.ingested += 1
+            log.info("Ingested image for product %s", product_id, extra={'event': 'images.ingested'})
+        except Exception as e:
+            with self._lock:
+                self._failed_at[source] = time.monotonic()
+                self.failed += 1
+            log.warning("Could not ingest image for product %s from %s: %s", product_id, source, e)
+        finally:
+            with self._lock:
+                self._pending.discard(source)
+
+    def _rebuild(self, key):
+        try:
+            with open(self._path(f'{key}.src'), 'rb') as f:
+                self._render(key, f.read())
+            self._touch(f'{key}.src')
+            with self._lock:
+                self.rebuilt += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            log.warning("Could not rebuild image %s: %s", key, e)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _submit(self, pending_key, fn, *args):
+        # Caller holds the lock
+        if pending_key in self._pending:
+            return
+        self._pending.add(pending_key)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='images')
+        self._pool.submit(fn, *args)
+
+    def schedule(self, products):
+        """Queue ingestion for products whose image isn't cached yet (a
+        catalog refresh listener; returns at once)"""
+        if not self.enabled:
+            return
+        self._ensure_loaded()
+        local = self._local_sources() if self.offline else None
+        now = time.monotonic()
+        with self._lock:
+            for product in products:
+                product_id = product['product_id']
+                if self.offline:
+                    source = local.get(product_id) or local.get(slugify(product.get('name')))
+                else:
+                    source = product.get('image')
+                entry = self._products.get(product_id)
+                if not source or (entry and entry[0] == source and entry[1] is not None):
+                    continue
+                if source in self._pending or now - self._failed_at.get(source, -RETRY_SECONDS) < RETRY_SECONDS:
+                    continue
+                key = self._keys.get(source)
+                if key and f'{key}.src' in self._files:
+                    self._products[product_id] = (source, key)
+                else:
+                    self._products[product_id] = (source, None)
+                    self._submit(source, self._ingest, product_id, source)
+
+    # ------------------------------------------------------------------
+    # Serving
+    # ------------------------------------------------------------------
+
+    def sources(self, product):
+        """``{'src', 'webp', 'jpeg'}`` (srcset strings) for a product's
+        cached image, or None to fall back to its source URL"""
+        entry = self._products.get(product.get('product_id'))
+        if not entry or entry[1] is None:
+            return None
+        key = entry[1]
+        urls = self._urls.get(key)
+        if urls is None:
+            base = f'{self.url_prefix}{key}'
+            urls = {
+                'src': f'{base}-{self.widths[len(self.widths) // 2]}.jpg',
+                'webp': ', '.join(f'{base}-{w}.webp {w}w' for w in self.widths),
+                'jpeg': ', '.join(f'{base}-{w}.jpg {w}w' for w in self.widths)
+            }
+            self._urls[key] = urls
+        return urls
+
+    def _serve(self, name):
+        match = _VARIANT.match(name)
+        if not match or int(match.group(2)) not in self.widths:
+            return 'Not found', 404
+        key, ext = match.group(1), match.group(3)
+        self._ensure_loaded()
+        path = self._path(name)
+        if name not in self._files:
+            source = self._sources.get(key)
+            if f'{key}.src' in self._files:
+                # Evicted; rebuild every size from the kept source off the
+                # request thread and send the source until then
+                with self._lock:
+                    self._submit(key, self._rebuild, key)
+                return self._serve_source(key)
+            elif source and not self.offline:
+                # Source evicted too; pages fall back until the next catalog
+                # refresh ingests it again
+                with self._lock:
+                    for product_id, (product_source, product_key) in list(self._products.items()):
+                        if product_key == key:
+                            self._products[product_id] = (product_source, None)
+                return redirect(source)
+            else:
+                return 'Not found', 404
+        self._touch(name)
+        self._touch(f'{key}.src')
+        response = send_file(path, mimetype=FORMATS[ext][1], max_age=MAX_AGE, conditional=True, etag=name)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    def _serve_source(self, key):
+        name = f'{key}.src'
+        self._touch(name)
+        try:
+            with open(self._path(name), 'rb') as f:
+                mimetype = source_mimetype(f.read(12))
+            # Not immutable: the URL is about to serve the resized image
+            return send_file(self._path(name), mimetype=mimetype, max_age=REBUILD_MAX_AGE, conditional=True)
+        except OSError:
+            return 'Not found', 404
+
+    def init_app(self, app):
+        app.add_url_rule(f'{self.url_prefix}<name>', 'product_image', self._serve)
+        app.jinja_env.globals['product_image'] = self.sources
+        if not self.enabled:
+            log.warning("Pillow is not installed; product images are served from their source URLs")
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'offline': self.offline,
+            'files': len(self._files),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'products': sum(1 for _, key in self._products.values() if key),
+            'pending': len(self._pending),
+            'ingested': self.ingested,
+            'rebuilt': self.rebuilt,
+            'failed': self.failed,
+            'evicted': self.evicted
+        }
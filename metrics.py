@@ -0,0 +1,248 @@
+"""Request and DynamoDB instrumentation.
+
+Hooks boto3's event system to count every DynamoDB call, its latency and the
+capacity it consumed, attributes them to the Flask endpoint that made them,
+times authentication, and renders everything in the Prometheus text format
+for ``/metrics``.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from flask import g, request
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# Samples kept per endpoint for the quantile estimates
+WINDOW_SIZE = 1024
+
+# The current request's trace; a context variable rather than a thread-local
+# so calls fanned out to I/O threads (with the context copied) still count
+# against the endpoint that made them
+_trace = ContextVar('metrics_trace', default=None)
+
+log = logging.getLogger('freshbasket.metrics')
+
+
+def _quantile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(q * len(sorted_samples)))
+    return sorted_samples[index]
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+class LatencyHistogram:
+    """Cumulative-bucket histogram plus a sliding window for quantiles"""
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.window = deque(maxlen=WINDOW_SIZE)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.window.append(seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantiles(self):
+        samples = sorted(self.window)
+        return {q: _quantile(samples, q) for q in QUANTILES}
+
+
+class Metrics:
+
+    def __init__(self, slow_request_seconds=None):
+        self.slow_request_seconds = slow_request_seconds
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        self.requests = defaultdict(LatencyHistogram)  # (endpoint, method) -> histogram
+        self.statuses = defaultdict(int)  # (endpoint, status) -> count
+        self.db_calls = defaultdict(int)  # (endpoint, operation) -> count
+        self.db_errors = defaultdict(int)  # (endpoint, operation) -> count
+        self.db_seconds = defaultdict(float)  # (endpoint, operation) -> seconds
+        self.db_capacity = defaultdict(float)  # (endpoint, operation) -> capacity units
+        self.auth = defaultdict(LatencyHistogram)  # (operation, outcome) -> histogram
+        self.throttled = defaultdict(int)  # (endpoint, scope) -> count
+
+    # ------------------------------------------------------------------
+    # boto3 hooks
+    # ------------------------------------------------------------------
+
+    def instrument_client(self, client):
+        """Register the DynamoDB hooks on a boto3 client and return it"""
+        events = client.meta.events
+        events.register('provide-client-params.dynamodb.*', self._request_capacity)
+        events.register('before-call.dynamodb.*', self._before_call)
+        events.register('after-call.dynamodb.*', self._after_call)
+        events.register('after-call-error.dynamodb.*', self._after_call_error)
+        return client
+
+    @staticmethod
+    def _request_capacity(params, model, **kwargs):
+        # Ask for consumed capacity wherever the operation can report it
+        if 'ReturnConsumedCapacity' in model.input_shape.members:
+            params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+    @staticmethod
+    def _before_call(model, context, **kwargs):
+        context['metrics_started'] = time.perf_counter()
+
+    def _after_call(self, model, parsed, context, http_response=None, **kwargs):
+        capacity = parsed.get('ConsumedCapacity')
+        if isinstance(capacity, dict):
+            capacity = [capacity]
+        units = sum(c.get('CapacityUnits', 0) for c in capacity or [])
+        # Service errors (conditional check failures, cancelled transactions,
+        # throttling) arrive here too, as parsed 4xx/5xx responses
+        error = 'Error' in parsed or (http_response is not None and http_response.status_code >= 400)
+        self._record_call(model.name, context, units, error=error)
+
+    def _after_call_error(self, model, context, **kwargs):
+        # Transport failures: no response was received at all
+        self._record_call(model.name, context, 0, error=True)
+
+    def _record_call(self, operation, context, units, error):
+        started = context.get('metrics_started')
+        elapsed = time.perf_counter() - started if started else 0.0
+        trace = _trace.get()
+        endpoint = trace['endpoint'] if trace else '-'
+        if trace is not None:
+            trace['calls'].append((operation, elapsed, units, error))
+        key = (endpoint, operation)
+        with self._lock:
+            self.db_calls[key] += 1
+            self.db_seconds[key] += elapsed
+            self.db_capacity[key] += units
+            if error:
+                self.db_errors[key] += 1
+
+    # ------------------------------------------------------------------
+    # Flask hooks
+    # ------------------------------------------------------------------
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        _trace.set({'endpoint': request.endpoint or 'unknown', 'calls': []})
+
+    def _finish_request(self, response):
+        started = g.pop('metrics_started', None)
+        trace = _trace.get()
+        if started is None or trace is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = trace['endpoint']
+        with self._lock:
+            self.requests[(endpoint, request.method)].observe(elapsed)
+            self.statuses[(endpoint, response.status_code)] += 1
+        if self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds:
+            self._log_slow_request(endpoint, elapsed, trace['calls'])
+        return response
+
+    @staticmethod
+    def _teardown_request(exc):
+        _trace.set(None)
+
+    @staticmethod
+    def _log_slow_request(endpoint, elapsed, calls):
+        log.warning("Slow request %s %s (%s) took %.1fms with %d DynamoDB calls",
+                    request.method, request.path, endpoint, elapsed * 1000, len(calls),
+                    extra={'event': 'request.slow', 'endpoint': endpoint, 'duration_ms': round(elapsed * 1000, 1),
+                           'db_calls': [{'operation': operation, 'ms': round(seconds * 1000, 1),
+                                         'capacity': units, 'error': error}
+                                        for operation, seconds, units, error in calls]})
+
+    # ------------------------------------------------------------------
+    # Authentication and rate limiting
+    # ------------------------------------------------------------------
+
+    def record_auth(self, operation, outcome, seconds):
+        """Time one login/register attempt, e.g. ('login', 'success', 0.21)"""
+        with self._lock:
+            self.auth[(operation, outcome)].observe(seconds)
+
+    def record_throttle(self, endpoint, scope):
+        """Count one request turned away by a rate limit, e.g. ('login', 'ip')"""
+        with self._lock:
+            self.throttled[(endpoint, scope)] += 1
+
+    # ------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------
+
+    def render(self, gauges=None):
+        """Prometheus text exposition; ``gauges`` adds ``{name: value}`` lines"""
+        lines = []
+        with self._lock:
+            lines.append('# TYPE freshbasket_request_duration_seconds histogram')
+            for (endpoint, method), hist in sorted(self.requests.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, hist.buckets):
+                    cumulative += count
+                    lines.append('freshbasket_request_duration_seconds_bucket'
+                                 f'{_labels(endpoint=endpoint, method=method, le=bound)} {cumulative}')
+                lines.append('freshbasket_request_duration_seconds_bucket'
+                             f'{_labels(endpoint=endpoint, method=method, le="+Inf")} {hist.count}')
+                lines.append(f'freshbasket_request_duration_seconds_sum{_labels(endpoint=endpoint, method=method)} {hist.total:.6f}')
+                lines.append(f'freshbasket_request_duration_seconds_count{_labels(endpoint=endpoint, method=method)} {hist.count}')
+
+            lines.append('# TYPE freshbasket_request_latency_seconds summary')
+            for (endpoint, method), hist in sorted(self.requests.items()):
+                for q, value in hist.quantiles().items():
+                    lines.append('freshbasket_request_latency_seconds'
+                                 f'{_labels(endpoint=endpoint, method=method, quantile=q)} {value:.6f}')
+                lines.append(f'freshbasket_request_latency_seconds_sum{_labels(endpoint=endpoint, method=method)} {hist.total:.6f}')
+                lines.append(f'freshbasket_request_latency_seconds_count{_labels(endpoint=endpoint, method=method)} {hist.count}')
+
+            lines.append('# TYPE freshbasket_auth_duration_seconds histogram')
+            for (operation, outcome), hist in sorted(self.auth.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, hist.buckets):
+                    cumulative += count
+                    lines.append('freshbasket_auth_duration_seconds_bucket'
+                                 f'{_labels(operation=operation, outcome=outcome, le=bound)} {cumulative}')
+                lines.append('freshbasket_auth_duration_seconds_bucket'
+                             f'{_labels(operation=operation, outcome=outcome, le="+Inf")} {hist.count}')
+                lines.append(f'freshbasket_auth_duration_seconds_sum{_labels(operation=operation, outcome=outcome)} {hist.total:.6f}')
+                lines.append(f'freshbasket_auth_duration_seconds_count{_labels(operation=operation, outcome=outcome)} {hist.count}')
+
+            lines.append('# TYPE freshbasket_responses_total counter')
+            for (endpoint, status), count in sorted(self.statuses.items()):
+                lines.append(f'freshbasket_responses_total{_labels(endpoint=endpoint, status=status)} {count}')
+
+            lines.append('# TYPE freshbasket_rate_limited_total counter')
+            for (endpoint, scope), count in sorted(self.throttled.items()):
+                lines.append(f'freshbasket_rate_limited_total{_labels(endpoint=endpoint, scope=scope)} {count}')
+
+            for name, values in (('freshbasket_dynamodb_calls_total', self.db_calls),
+                                 ('freshbasket_dynamodb_errors_total', self.db_errors),
+                                 ('freshbasket_dynamodb_call_seconds_total', self.db_seconds),
+                                 ('freshbasket_dynamodb_consumed_capacity_total', self.db_capacity)):
+                lines.append(f'# TYPE {name} counter')
+                for (endpoint, operation), value in sorted(values.items()):
+                    lines.append(f'{name}{_labels(endpoint=endpoint, operation=operation)} {value:g}')
+
+        for name, value in (gauges or {}).items():
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value:g}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,156 @@
+"""bcrypt hashing off the request threads.
+
+Hashes and checks run on a small process pool so a burst of logins cannot
+tie up every web worker with CPU-bound work. The number of hashes queued or
+running is capped; past that, calls fail fast with ``HasherBusy`` instead of
+piling up behind each other. A call that waits longer than ``timeout`` also
+raises ``HasherBusy``; its slot stays taken until the worker is really done.
+If a worker process dies, the calls caught up in it raise ``HasherBusy`` and
+the next call starts a fresh pool. The bcrypt cost is configurable and
+hashes made with a different cost can be upgraded on the next successful
+login.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Too many hashes are already queued; try again shortly"""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def hash_rounds(hashed):
+    """The cost factor encoded in a ``$2b$12$...`` hash, or None"""
+    parts = hashed.split('$')
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+
+    def __init__(self, rounds=12, workers=2, max_pending=8, timeout=30):
+        """``workers`` = 0 hashes on the calling thread (still bounded by
+        ``max_pending``), which is what tests and benchmarks want"""
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.restarts = 0
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # Forking a threaded web server can copy held locks into
+                    # the child; spawn starts the workers clean. Under
+                    # `python app.py` they re-run app.py as __mp_main__, which
+                    # is why its import starts no threads and writes no files
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _discard(self, pool):
+        """Drop a broken pool so the next call starts a new one"""
+        with self._pool_lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        with self._stats_lock:
+            self.restarts += 1
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future=None):
+        with self._stats_lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise HasherBusy("Password hashing queue is full")
+        with self._stats_lock:
+            self.in_flight += 1
+        if self.workers <= 0:
+            try:
+                return fn(*args)
+            finally:
+                self._release()
+        try:
+            pool = self._executor()
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            self._discard(pool)
+            raise HasherBusy("Password hashing workers are restarting") from None
+        except BaseException:
+            self._release()
+            raise
+        # Released when the worker finishes, not when the caller stops waiting
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._stats_lock:
+                self.timed_out += 1
+            raise HasherBusy(f"Password hashing took over {self.timeout}s") from None
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise HasherBusy("Password hashing workers are restarting") from None
+
+    def hash(self, password):
+        return self._run(_hash, password.encode('utf-8'), self.rounds).decode('utf-8')
+
+    def verify(self, password, hashed):
+        return self._run(_check, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def warm_up(self):
+        """Start the worker processes ahead of the first login"""
+        if self.workers > 0:
+            pool = self._executor()
+            for future in [pool.submit(hash_rounds, '') for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {
+            'rounds': self.rounds,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'restarts': self.restarts
+        }
@@ -0,0 +1,184 @@
+"""Token-bucket rate limiting.
+
+Every limit is a bucket of ``burst`` tokens refilled at ``rate`` tokens a
+second, kept per route and per client IP or account. A request takes one
+token from each bucket that applies, or is turned away with the number of
+seconds until one is free. A full bucket is the same as no bucket, so stores
+only keep buckets that are still refilling.
+
+Limits are written as ``<endpoint>:<ip|account>=<count>/<period>`` (for
+example ``login:account=5/min``, ``contact:ip=10/5min``), allowing ``count``
+requests per period with bursts of up to ``count``.
+
+``MemoryBucketStore`` keeps buckets in this process. ``SqliteBucketStore``
+shares them between every worker on the host through one SQLite file, like
+the session store, so limits hold however many workers run.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import request
+
+Limit = namedtuple('Limit', 'endpoint scope rate burst')
+
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'min': 60, 'minute': 60, 'h': 3600, 'hour': 3600, 'day': 86400}
+_LIMIT = re.compile(r'^([\w.]+):(\w+)=(\d+)/(\d*)([a-z]+)$')
+
+
+def parse_limits(spec):
+    """``'login:ip=20/min,contact:ip=10/5min'`` -> ``[Limit, ...]``"""
+    limits = []
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        match = _LIMIT.match(part)
+        if not match or match.group(5) not in PERIODS:
+            raise ValueError(f"bad rate limit {part!r}; expected e.g. 'login:ip=20/min'")
+        endpoint, scope, count, multiple, unit = match.groups()
+        period = int(multiple or 1) * PERIODS[unit]
+        limits.append(Limit(endpoint, scope, int(count) / period, int(count)))
+    return limits
+
+
+def _refill(tokens, stamp, now, rate, burst):
+    return min(burst, tokens + (now - stamp) * rate)
+
+
+class MemoryBucketStore:
+    """Buckets in a dict ordered by last use; each ``take`` also drops
+    least-recently-used buckets that have refilled, so memory tracks the
+    clients currently being limited"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, stamp, full_at)
+
+    def take(self, key, rate, burst):
+        """Take a token; returns 0.0, or the seconds until one is available"""
+        now = time.time()
+        with self._lock:
+            entry = self._buckets.pop(key, None)
+            tokens = _refill(entry[0], entry[1], now, rate, burst) if entry else burst
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            while self._buckets:
+                oldest = next(iter(self._buckets.values()))
+                if oldest[2] > now and len(self._buckets) <= self.max_keys:
+                    break
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SqliteBucketStore:
+    """Buckets in an SQLite file shared by every worker process on the host"""
+
+    # Drop refilled buckets once every this many takes
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS buckets ('
+                     'key TEXT PRIMARY KEY, tokens REAL NOT NULL, stamp REAL NOT NULL, full_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS buckets_full_at ON buckets (full_at)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst):
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, stamp FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(row[0], row[1], now, rate, burst) if row else burst
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, stamp, full_at) VALUES (?, ?, ?, ?)',
+                         (key, tokens, now, now + (burst - tokens) / rate))
+            self._takes += 1
+            if self._takes % self.SWEEP_EVERY == 0:
+                conn.execute('DELETE FROM buckets WHERE full_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM buckets').fetchone()[0]
+
+
+class RateLimiter:
+
+    def __init__(self, store, limits, methods=('POST',), on_throttle=None):
+        """``on_throttle(endpoint, scope)`` is called for every request a
+        bucket turns away"""
+        self.store = store
+        self.methods = set(methods)
+        self.on_throttle = on_throttle
+        self.limits = {}
+        for limit in limits:
+            self.limits.setdefault(limit.endpoint, []).append(limit)
+        self.throttled = 0
+
+    def check(self, endpoint, identities):
+        """Take a token from every bucket of ``endpoint`` whose scope is in
+        ``identities`` (``{'ip': ..., 'account': ...}``); returns 0.0 or
+        the seconds to wait"""
+        wait = 0.0
+        for limit in self.limits.get(endpoint, ()):
+            identity = identities.get(limit.scope)
+            if not identity:
+                continue
+            limit_wait = self.store.take(f'{endpoint}:{limit.scope}:{identity}', limit.rate, limit.burst)
+            if limit_wait:
+                self.throttled += 1
+                if self.on_throttle:
+                    self.on_throttle(endpoint, limit.scope)
+                wait = max(wait, limit_wait)
+        return wait
+
+    def init_app(self, app, identify, respond):
+        """Check every limited request before its view runs. ``identify()``
+        returns the request's identities; ``respond(seconds)`` builds the
+        response for a throttled one"""
+
+        @app.before_request
+        def _rate_limit():
+            if request.method not in self.methods or request.endpoint not in self.limits:
+                return None
+            wait = self.check(request.endpoint, identify())
+            return respond(wait) if wait else None
+
+    def stats(self):
+        return {
+            'limits': {endpoint: [f'{l.scope}={l.burst}/{l.burst / l.rate:g}s' for l in limits]
+                       for endpoint, limits in self.limits.items()},
+            'buckets': len(self.store),
+            'throttled': self.throttled
+        }
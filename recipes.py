@@ -0,0 +1,209 @@
+"""Recipe suggestions for the AI assistant.
+
+The bundled corpus (data/recipes.json) is loaded once into an inverted index
+from ingredient to recipes. Each ingredient's postings are a bitset, a Python
+int with bit ``r`` set when recipe ``r`` uses it, so a query never walks the
+corpus: the selected ingredients' bitsets are added up bit-sliced (one int per
+binary digit of the overlap count), and recipes are read off tier by tier,
+most shared ingredients first and fewest missing ones next. Rankings are
+memoized in an LRU keyed by the normalized ingredient set.
+
+Ingredients are linked to the live catalog (fed by the catalog cache, like the
+search index), so every suggestion lists products that can be bought for it.
+"""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+
+# Words that describe a product rather than name the ingredient
+DESCRIPTORS = {'fresh', 'green', 'red', 'sweet', 'ripe', 'organic', 'baby', 'large', 'small'}
+# Selected ingredients beyond this are ignored
+MAX_QUERY_INGREDIENTS = 32
+
+_WORD = re.compile(r'[a-z]+')
+
+
+def _singular(word):
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('oes'):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def ingredient_key(name):
+    """``'Fresh Tomatoes'`` and ``'tomato'`` -> ``'tomato'``"""
+    words = _WORD.findall(str(name or '').lower())
+    kept = [w for w in words if w not in DESCRIPTORS] or words
+    if not kept:
+        return ''
+    return ' '.join(kept[:-1] + [_singular(kept[-1])])
+
+
+def load_recipes(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _bitset(positions):
+    """An int with the given bits set, built in one pass"""
+    buf = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        buf[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _bits(mask):
+    """Positions of the set bits in ``mask``, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class RecipeBook:
+
+    def __init__(self, recipes, cache_size=4096):
+        self.cache_size = cache_size
+        self._recipes = list(recipes)
+        self._keys = []  # per recipe, the ingredient key of each ingredient
+        postings = {}
+        by_size = {}
+        for position, recipe in enumerate(self._recipes):
+            keys = [ingredient_key(i['item']) for i in recipe['ingredients']]
+            self._keys.append(keys)
+            for key in set(keys):
+                postings.setdefault(key, []).append(position)
+            by_size.setdefault(len(set(keys)), []).append(position)
+        self._postings = {key: _bitset(p) for key, p in postings.items()}  # ingredient key -> bitset of recipes
+        self._by_size = {size: _bitset(p) for size, p in by_size.items()}  # distinct ingredients -> bitset
+        self._sizes = sorted(self._by_size)
+        self._products = {}  # ingredient key -> [product listing, ...]
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # frozenset of keys -> (limit, ((position, overlap), ...))
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path, **options):
+        return cls(load_recipes(path), **options)
+
+    # ------------------------------------------------------------------
+    # Catalog links
+    # ------------------------------------------------------------------
+
+    def link_products(self, products):
+        """Map ingredients to the in-stock products of the active catalog"""
+        linked = {}
+        for product in products:
+            if int(product.get('stock', 0)) <= 0:
+                continue
+            key = ingredient_key(product.get('name'))
+            if key in self._postings:
+                linked.setdefault(key, []).append({
+                    'product_id': product['product_id'],
+                    'name': product.get('name'),
+                    'price': product.get('price'),
+                    'unit': product.get('unit'),
+                    'image': product.get('image')
+                })
+        self._products = linked
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _rank(self, keys, limit):
+        """``((position, overlap), ...)`` for the best ``limit`` recipes"""
+        postings = [self._postings[key] for key in keys]
+        # planes[i] holds bit i of every recipe's overlap count
+        planes = []
+        for carry in postings:
+            i = 0
+            while carry:
+                if i == len(planes):
+                    planes.append(carry)
+                    break
+                plane = planes[i]
+                planes[i] = plane ^ carry
+                carry &= plane
+                i += 1
+        candidates = 0
+        for bits in postings:
+            candidates |= bits
+        ranked = []
+        # No recipe's count needs more digits than there are planes
+        for overlap in range(min(len(postings), (1 << len(planes)) - 1), 0, -1):
+            tier = candidates
+            for i, plane in enumerate(planes):
+                tier &= plane if overlap >> i & 1 else ~plane
+            if not tier:
+                continue
+            candidates &= ~tier
+            # Within a tier, recipes that need fewer extra ingredients first
+            for size in self._sizes:
+                if size < overlap:
+                    continue
+                for position in _bits(tier & self._by_size[size]):
+                    ranked.append((position, overlap))
+                    if len(ranked) == limit:
+                        return tuple(ranked)
+        return tuple(ranked)
+
+    def _view(self, position, selected):
+        recipe = self._recipes[position]
+        keys = self._keys[position]
+        products = []
+        for ingredient, key in zip(recipe['ingredients'], keys):
+            for product in self._products.get(key, ()):
+                products.append(dict(product, ingredient=ingredient['item'], selected=key in selected))
+        return {
+            'id': recipe['id'],
+            'name': recipe['name'],
+            'time': recipe['time'],
+            'difficulty': recipe['difficulty'],
+            'servings': recipe['servings'],
+            'ingredients_list': [i['text'] for i in recipe['ingredients']] + list(recipe.get('pantry', ())),
+            'instructions': recipe['instructions'],
+            'tips': recipe['tips'],
+            'matched': [i['item'] for i, key in zip(recipe['ingredients'], keys) if key in selected],
+            'missing': [i['item'] for i, key in zip(recipe['ingredients'], keys) if key not in selected],
+            'products': products
+        }
+
+    def suggest(self, ingredients, limit=5):
+        """The best ``limit`` recipes for the named ingredients, best first"""
+        selected = frozenset(k for k in map(ingredient_key, ingredients[:MAX_QUERY_INGREDIENTS])
+                             if k in self._postings)
+        if not selected:
+            return []
+        with self._lock:
+            cached = self._cache.get(selected)
+            if cached is not None and cached[0] >= limit:
+                self._cache.move_to_end(selected)
+                self.hits += 1
+                ranked = cached[1]
+            else:
+                ranked = None
+                self.misses += 1
+        if ranked is None:
+            ranked = self._rank(selected, limit)
+            with self._lock:
+                self._cache[selected] = (limit, ranked)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return [self._view(position, selected) for position, _ in ranked[:limit]]
+
+    def stats(self):
+        return {
+            'recipes': len(self._recipes),
+            'ingredients': len(self._postings),
+            'linked_ingredients': len(self._products),
+            'cached_queries': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -0,0 +1,33 @@
+"""Storage backends behind one set of repository interfaces.
+
+``create_repositories('dynamodb' | 'sqlite' | 'memory', **options)`` returns a
+``Repositories`` whose ``products``, ``users``, ``carts``, ``orders`` and
+``contacts`` attributes are all the app ever talks to. Backends are imported
+on demand, so the SQLite and in-memory ones work without boto3 installed.
+"""
+
+from .base import (
+    DuplicateOrderError, MAX_CART_QUANTITY, MAX_TRANSACT_ITEMS, OutOfStockError, PRODUCT_LIST_ATTRIBUTES,
+    PriceChangedError, Repositories, with_product_index_keys
+)
+
+BACKENDS = ('dynamodb', 'sqlite', 'memory')
+
+
+def create_repositories(backend='dynamodb', **options):
+    if backend == 'dynamodb':
+        from .dynamodb import DynamoDBRepositories
+        return DynamoDBRepositories(**options)
+    if backend == 'sqlite':
+        from .sqlite import SqliteRepositories
+        return SqliteRepositories(**options)
+    if backend == 'memory':
+        from .memory import MemoryRepositories
+        return MemoryRepositories(**options)
+    raise ValueError(f"Unknown storage backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+
+__all__ = [
+    'BACKENDS', 'DuplicateOrderError', 'MAX_CART_QUANTITY', 'MAX_TRANSACT_ITEMS', 'OutOfStockError',
+    'PRODUCT_LIST_ATTRIBUTES', 'PriceChangedError', 'Repositories', 'create_repositories', 'with_product_index_keys'
+]
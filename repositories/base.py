@@ -0,0 +1,221 @@
+"""Repository interfaces shared by every storage backend.
+
+Items go in and come out as plain dicts shaped like the DynamoDB items the
+app has always used (numbers come back as ``Decimal``), so route code does
+not care which backend is behind it.
+"""
+
+from decimal import Decimal
+
+# Columns the product listing templates actually render
+PRODUCT_LIST_ATTRIBUTES = ['product_id', 'name', 'category', 'price', 'unit',
+                           'description', 'image', 'stock']
+
+# Largest number of rows one atomic cart/order write may touch; this is
+# DynamoDB's TransactWriteItems limit and the other backends honour it too
+MAX_TRANSACT_ITEMS = 100
+
+# Most of one product a cart line may hold; adds beyond it are clamped
+MAX_CART_QUANTITY = 100
+
+
+class OutOfStockError(Exception):
+    """An order line asked for more than is left"""
+
+    def __init__(self, item):
+        super().__init__(f"Not enough stock for product {item['product_id']}")
+        self.item = item
+
+
+class PriceChangedError(Exception):
+    """An order line's price no longer matches the product's"""
+
+    def __init__(self, item):
+        super().__init__(f"Price changed for product {item['product_id']}")
+        self.item = item
+
+
+class DuplicateOrderError(Exception):
+    """An order with this id has already been placed"""
+
+    def __init__(self, order_id):
+        super().__init__(f"Order {order_id} already exists")
+        self.order_id = order_id
+
+
+def to_item(value):
+    """Normalise a value the way DynamoDB stores it: ints and floats become
+    Decimal (bools stay bools), containers are copied"""
+    if isinstance(value, bool) or value is None or isinstance(value, (str, Decimal)):
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: to_item(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_item(v) for v in value]
+    return value
+
+
+def with_product_index_keys(product):
+    """Return a copy of ``product`` with the category index key set (or
+    removed for inactive products)"""
+    item = dict(product)
+    item.pop('id', None)
+    if item.get('active') and item.get('category'):
+        item['active_category'] = item['category'].lower()
+    else:
+        item.pop('active_category', None)
+    return item
+
+
+def new_cart_row(user_email, product, quantity, added_at):
+    return {
+        'user_email': user_email,
+        'product_id': product['product_id'],
+        'name': product['name'],
+        'price': product['price'],
+        'unit': product['unit'],
+        'quantity': quantity,
+        'image': product['image'],
+        'added_at': added_at
+    }
+
+
+def listing_view(product):
+    return {k: product[k] for k in PRODUCT_LIST_ATTRIBUTES if k in product}
+
+
+class ProductRepo:
+
+    def list_active(self):
+        """Every active product, listing columns only"""
+        raise NotImplementedError
+
+    def list_active_by_category(self, category_key):
+        """Active products whose lower-cased category is ``category_key``"""
+        raise NotImplementedError
+
+    def get(self, product_id):
+        raise NotImplementedError
+
+    def get_many(self, product_ids):
+        """``{product_id: product}`` for the ids that exist, in one round trip"""
+        raise NotImplementedError
+
+    def list_all(self):
+        """Every product, active or not (debug/admin use)"""
+        raise NotImplementedError
+
+    def put_many(self, products):
+        raise NotImplementedError
+
+    def is_empty(self):
+        raise NotImplementedError
+
+    def seed_if_empty(self, products):
+        """Load ``products`` into an empty catalog; returns how many were written"""
+        if not self.is_empty():
+            return 0
+        self.put_many(products)
+        return len(products)
+
+
+class UserRepo:
+
+    def get(self, email):
+        raise NotImplementedError
+
+    def put(self, user):
+        raise NotImplementedError
+
+    def put_many(self, users):
+        raise NotImplementedError
+
+    def update_profile(self, email, name, phone, address):
+        raise NotImplementedError
+
+    def update_password(self, email, password_hash):
+        raise NotImplementedError
+
+    def list_all(self):
+        raise NotImplementedError
+
+
+class CartRepo:
+
+    def list(self, user_email):
+        raise NotImplementedError
+
+    def add(self, user_email, product, quantity, added_at):
+        """Add ``quantity`` to a cart row, creating it if needed, in one write;
+        the row's quantity is capped at MAX_CART_QUANTITY"""
+        raise NotImplementedError
+
+    def add_many(self, user_email, lines, added_at):
+        """Atomically apply ``[(product, quantity), ...]`` like ``add``"""
+        raise NotImplementedError
+
+    def set_quantities(self, user_email, changes, added_at):
+        """Atomically set ``[(product_id, product, quantity), ...]``; a zero
+        quantity deletes the row"""
+        raise NotImplementedError
+
+    def remove(self, user_email, product_id):
+        raise NotImplementedError
+
+    def put_many(self, rows):
+        """Overwrite whole cart rows (used by the guest cart merge)"""
+        raise NotImplementedError
+
+
+class OrderRepo:
+
+    def place(self, order):
+        """Atomically decrement stock for every line, store the order, bump the
+        user's totals and clear those lines from the cart. Each line's price
+        must still be the product's price.
+
+        Raises OutOfStockError, PriceChangedError or DuplicateOrderError;
+        nothing is written then.
+        """
+        raise NotImplementedError
+
+    def get(self, order_id):
+        raise NotImplementedError
+
+    def page_for_user(self, user_email, limit, start_key=None):
+        """One page of the user's orders, newest first: ``(orders, next_key)``"""
+        raise NotImplementedError
+
+
+class ContactRepo:
+
+    def add(self, message):
+        raise NotImplementedError
+
+    def add_many(self, messages):
+        raise NotImplementedError
+
+
+class Repositories:
+    """The set of repositories one backend provides"""
+
+    backend = None
+
+    def __init__(self, products, users, carts, orders, contacts):
+        self.products = products
+        self.users = users
+        self.carts = carts
+        self.orders = orders
+        self.contacts = contacts
+
+    def init_schema(self):
+        """Create whatever tables/indexes the backend needs (idempotent)"""
+
+    def warm_up(self):
+        """Open connections ahead of the first request"""
+
+    def describe(self):
+        """Backend details for the debug routes"""
+        return {'backend': self.backend}
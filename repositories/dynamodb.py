@@ -0,0 +1,655 @@
+"""DynamoDB backend (the production store)."""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.dynamodb.conditions import Key, Attr
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+from .base import (
+    CartRepo, ContactRepo, DuplicateOrderError, MAX_CART_QUANTITY, OrderRepo, OutOfStockError,
+    PriceChangedError, PRODUCT_LIST_ATTRIBUTES, ProductRepo, Repositories, UserRepo,
+    with_product_index_keys
+)
+
+PRODUCTS_TABLE = 'FreshBasket_Products'
+USERS_TABLE = 'FreshBasket_Users'
+CART_TABLE = 'FreshBasket_Cart'
+ORDERS_TABLE = 'FreshBasket_Orders'
+CONTACT_MESSAGES_TABLE = 'FreshBasket_ContactMessages'
+
+# BatchWriteItem accepts at most 25 put/delete requests per call
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_RETRIES = 5
+BATCH_WRITE_BACKOFF = 0.05
+# BatchGetItem accepts at most 100 keys per call
+BATCH_GET_SIZE = 100
+
+# Sparse GSI on Products: only active products carry ``active_category``
+# (the lower-cased category), so a category page queries just its own rows.
+PRODUCT_CATEGORY_INDEX = 'ActiveCategoryIndex'
+
+PRODUCT_CATEGORY_INDEX_SPEC = {
+    'IndexName': PRODUCT_CATEGORY_INDEX,
+    'KeySchema': [
+        {'AttributeName': 'active_category', 'KeyType': 'HASH'},
+        {'AttributeName': 'product_id', 'KeyType': 'RANGE'}
+    ],
+    'Projection': {'ProjectionType': 'ALL'}
+}
+
+# Orders by user, newest first: order history pages Query this instead of
+# scanning the whole Orders table.
+USER_ORDERS_INDEX = 'UserOrdersIndex'
+
+USER_ORDERS_INDEX_SPEC = {
+    'IndexName': USER_ORDERS_INDEX,
+    'KeySchema': [
+        {'AttributeName': 'user_email', 'KeyType': 'HASH'},
+        {'AttributeName': 'created_at', 'KeyType': 'RANGE'}
+    ],
+    'Projection': {'ProjectionType': 'ALL'}
+}
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+log = logging.getLogger('freshbasket.storage')
+
+
+def _to_dynamodb(values):
+    """Serialize a plain dict into DynamoDB's wire format for the low-level client"""
+    return {k: _serializer.serialize(v) for k, v in values.items()}
+
+
+def _from_dynamodb(item):
+    """The reverse of ``_to_dynamodb``"""
+    return {k: _deserializer.deserialize(v) for k, v in item.items()}
+
+
+class LazyHandle:
+    """Stand-in for a boto3 resource, client or table that is only created on
+    first use, so importing the app makes no AWS calls and costs next to
+    nothing"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._obj = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._obj is None:
+            with self._lock:
+                if self._obj is None:
+                    self._obj = self._factory()
+        return self._obj
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+
+# ============================================================================
+# SCAN & QUERY HELPERS
+# ============================================================================
+
+def _projection_params(attributes):
+    """Build ProjectionExpression params, aliasing every name since
+    attributes like ``name`` are DynamoDB reserved words"""
+    names = {f'#p{i}': attr for i, attr in enumerate(attributes)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names
+    }
+
+
+def _with_projection(kwargs, attributes):
+    if attributes:
+        projection = _projection_params(attributes)
+        names = dict(kwargs.pop('ExpressionAttributeNames', {}))
+        names.update(projection.pop('ExpressionAttributeNames'))
+        kwargs.update(projection, ExpressionAttributeNames=names)
+    return kwargs
+
+
+def _scan_pages(table, **kwargs):
+    """Yield items from one scan (or scan segment), following LastEvaluatedKey"""
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get('Items', [])
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def scan_table(table, segments=1, attributes=None, **kwargs):
+    """Scan a whole table as a generator of items.
+
+    Pagination is followed until DynamoDB stops returning LastEvaluatedKey.
+    With ``segments`` > 1 the table is split with Segment/TotalSegments and
+    the segments are read concurrently on a thread pool; items are yielded as
+    they arrive, so ordering across segments is not defined. ``attributes``
+    limits the columns fetched via ProjectionExpression. Any other keyword
+    (FilterExpression, Limit, ...) is passed through to ``table.scan``.
+    """
+    kwargs = _with_projection(kwargs, attributes)
+
+    if segments <= 1:
+        yield from _scan_pages(table, **kwargs)
+        return
+
+    done = object()
+    results = queue.Queue()
+
+    def read_segment(segment):
+        # boto3 fills ExpressionAttributeNames/Values in place, so every
+        # segment gets its own copies
+        segment_kwargs = {k: dict(v) if isinstance(v, dict) else v for k, v in kwargs.items()}
+        try:
+            for item in _scan_pages(table, Segment=segment, TotalSegments=segments, **segment_kwargs):
+                results.put(item)
+        finally:
+            results.put(done)
+
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        futures = [pool.submit(read_segment, segment) for segment in range(segments)]
+        finished = 0
+        while finished < segments:
+            item = results.get()
+            if item is done:
+                finished += 1
+            else:
+                yield item
+        # Surface the first segment failure, if any
+        for future in futures:
+            future.result()
+
+
+def query_page(table, attributes=None, **kwargs):
+    """Run one Query and return ``(items, last_evaluated_key)``"""
+    response = table.query(**_with_projection(kwargs, attributes))
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+
+def query_table(table, attributes=None, **kwargs):
+    """Run a Query as a generator of items, following LastEvaluatedKey"""
+    while True:
+        items, last_key = query_page(table, attributes=attributes, **kwargs)
+        yield from items
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+# ============================================================================
+# REPOSITORIES
+# ============================================================================
+
+class DynamoDBProductRepo(ProductRepo):
+
+    def __init__(self, store):
+        self.store = store
+        self.table = store.table(PRODUCTS_TABLE)
+
+    def list_active(self):
+        return list(scan_table(self.table, segments=self.store.scan_segments,
+                               attributes=PRODUCT_LIST_ATTRIBUTES,
+                               FilterExpression=Attr('active').eq(True)))
+
+    def list_active_by_category(self, category_key):
+        return list(query_table(self.table, IndexName=PRODUCT_CATEGORY_INDEX,
+                                attributes=PRODUCT_LIST_ATTRIBUTES,
+                                KeyConditionExpression=Key('active_category').eq(category_key)))
+
+    def get(self, product_id):
+        return self.table.get_item(Key={'product_id': str(product_id)}).get('Item')
+
+    def get_many(self, product_ids):
+        keys = [{'product_id': str(product_id)} for product_id in dict.fromkeys(product_ids)]
+        found = {}
+        for start in range(0, len(keys), BATCH_GET_SIZE):
+            pending = {self.table.table_name: {'Keys': keys[start:start + BATCH_GET_SIZE]}}
+            for attempt in range(BATCH_WRITE_RETRIES + 1):
+                response = self.store.dynamodb.batch_get_item(RequestItems=pending)
+                for item in response.get('Responses', {}).get(self.table.table_name, []):
+                    found[item['product_id']] = item
+                pending = response.get('UnprocessedKeys') or {}
+                if not pending:
+                    break
+                time.sleep(BATCH_WRITE_BACKOFF * (2 ** attempt))
+        return found
+
+    def list_all(self):
+        return list(scan_table(self.table, segments=self.store.scan_segments))
+
+    def put_many(self, products):
+        self.store.batch_write(self.table.table_name, [
+            {'PutRequest': {'Item': with_product_index_keys(p)}} for p in products
+        ])
+
+    def is_empty(self):
+        return self.table.scan(Limit=1)['Count'] == 0
+
+    def backfill_index_keys(self):
+        """Set ``active_category`` on active products written before the index existed"""
+        missing = list(scan_table(self.table,
+                                  FilterExpression=Attr('active').eq(True) & Attr('active_category').not_exists()))
+        if missing:
+            self.put_many(missing)
+            log.info("Backfilled category index keys on %d products", len(missing))
+
+
+class DynamoDBUserRepo(UserRepo):
+
+    def __init__(self, store):
+        self.store = store
+        self.table = store.table(USERS_TABLE)
+
+    def get(self, email):
+        return self.table.get_item(Key={'email': email}).get('Item')
+
+    def put(self, user):
+        self.table.put_item(Item=user)
+
+    def put_many(self, users):
+        self.store.batch_write(self.table.table_name, [{'PutRequest': {'Item': u}} for u in users])
+
+    def update_profile(self, email, name, phone, address):
+        self.table.update_item(
+            Key={'email': email},
+            UpdateExpression="SET #n = :name, phone = :phone, address = :address",
+            ExpressionAttributeNames={'#n': 'name'},
+            ExpressionAttributeValues={':name': name, ':phone': phone, ':address': address}
+        )
+
+    def update_password(self, email, password_hash):
+        self.table.update_item(
+            Key={'email': email},
+            UpdateExpression="SET password = :password",
+            ExpressionAttributeValues={':password': password_hash}
+        )
+
+    def list_all(self):
+        return list(scan_table(self.table, segments=self.store.scan_segments))
+
+
+def _cart_upsert_params(product, quantity, added_at, replace=False):
+    """UpdateExpression params that add ``quantity`` to a cart row (or set it,
+    with ``replace``), creating the row with the denormalized product fields
+    if it doesn't exist yet. An add that would take the row past
+    MAX_CART_QUANTITY fails its condition; see ``_cart_clamp_params``."""
+    params = {
+        'UpdateExpression': (
+            'SET #name = if_not_exists(#name, :name), #price = if_not_exists(#price, :price), '
+            '#unit = if_not_exists(#unit, :unit), #image = if_not_exists(#image, :image), '
+            '#added_at = if_not_exists(#added_at, :added_at)'
+            + (', #quantity = :qty' if replace else ' ADD #quantity :qty')
+        ),
+        'ExpressionAttributeNames': {
+            '#name': 'name', '#price': 'price', '#unit': 'unit',
+            '#image': 'image', '#added_at': 'added_at', '#quantity': 'quantity'
+        },
+        'ExpressionAttributeValues': {
+            ':name': product['name'],
+            ':price': product['price'],
+            ':unit': product['unit'],
+            ':image': product['image'],
+            ':added_at': added_at,
+            ':qty': quantity
+        }
+    }
+    if not replace:
+        params['ConditionExpression'] = 'attribute_not_exists(#quantity) OR #quantity <= :room'
+        params['ExpressionAttributeValues'][':room'] = MAX_CART_QUANTITY - quantity
+    return params
+
+
+def _cart_clamp_params(product, added_at):
+    """Fill a cart row up to MAX_CART_QUANTITY, for an add that would pass it"""
+    return _cart_upsert_params(product, MAX_CART_QUANTITY, added_at, replace=True)
+
+
+class DynamoDBCartRepo(CartRepo):
+
+    def __init__(self, store):
+        self.store = store
+        self.table = store.table(CART_TABLE)
+
+    def list(self, user_email):
+        return list(query_table(self.table, KeyConditionExpression=Key('user_email').eq(user_email)))
+
+    def add(self, user_email, product, quantity, added_at):
+        key = {'user_email': user_email, 'product_id': product['product_id']}
+        try:
+            self.table.update_item(Key=key, **_cart_upsert_params(product, quantity, added_at))
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            self.table.update_item(Key=key, **_cart_clamp_params(product, added_at))
+
+    def _update_action(self, user_email, product, params):
+        action = {
+            'TableName': self.table.table_name,
+            'Key': _to_dynamodb({'user_email': user_email, 'product_id': product['product_id']}),
+            'UpdateExpression': params['UpdateExpression'],
+            'ExpressionAttributeNames': params['ExpressionAttributeNames'],
+            'ExpressionAttributeValues': _to_dynamodb(params['ExpressionAttributeValues'])
+        }
+        if 'ConditionExpression' in params:
+            action['ConditionExpression'] = params['ConditionExpression']
+        return {'Update': action}
+
+    def add_many(self, user_email, lines, added_at):
+        actions = [self._update_action(user_email, product, _cart_upsert_params(product, quantity, added_at))
+                   for product, quantity in lines]
+        try:
+            self.store.client.transact_write_items(TransactItems=actions)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons', [])
+            full = [n for n, reason in enumerate(reasons) if reason.get('Code') == 'ConditionalCheckFailed']
+            if not full:
+                raise
+            # Those lines would pass the cap; fill them up to it instead
+            for n in full:
+                product = lines[n][0]
+                actions[n] = self._update_action(user_email, product, _cart_clamp_params(product, added_at))
+            self.store.client.transact_write_items(TransactItems=actions)
+
+    def set_quantities(self, user_email, changes, added_at):
+        actions = []
+        for product_id, product, quantity in changes:
+            if quantity == 0:
+                actions.append({'Delete': {
+                    'TableName': self.table.table_name,
+                    'Key': _to_dynamodb({'user_email': user_email, 'product_id': product_id})
+                }})
+            else:
+                params = _cart_upsert_params(product, quantity, added_at, replace=True)
+                actions.append(self._update_action(user_email, product, params))
+        self.store.client.transact_write_items(TransactItems=actions)
+
+    def remove(self, user_email, product_id):
+        self.table.delete_item(Key={'user_email': user_email, 'product_id': product_id})
+
+    def put_many(self, rows):
+        self.store.batch_write(self.table.table_name, [{'PutRequest': {'Item': row}} for row in rows])
+
+
+class DynamoDBOrderRepo(OrderRepo):
+
+    def __init__(self, store):
+        self.store = store
+        self.table = store.table(ORDERS_TABLE)
+
+    def place(self, order):
+        """One TransactWriteItems call; the order id doubles as the
+        ClientRequestToken, so a retried call never creates a second order"""
+        items = order['items']
+        actions = []
+        for i in items:
+            actions.append({'Update': {
+                'TableName': self.store.table_name(PRODUCTS_TABLE),
+                'Key': _to_dynamodb({'product_id': i['product_id']}),
+                'UpdateExpression': 'SET stock = stock - :qty',
+                'ConditionExpression': 'attribute_exists(product_id) AND stock >= :qty AND price = :price',
+                'ExpressionAttributeValues': _to_dynamodb({':qty': i['quantity'], ':price': i['price']}),
+                # Tells a price change apart from a stock shortfall
+                'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+            }})
+        actions.append({'Put': {
+            'TableName': self.table.table_name,
+            'Item': _to_dynamodb(order),
+            'ConditionExpression': 'attribute_not_exists(order_id)'
+        }})
+        actions.append({'Update': {
+            'TableName': self.store.table_name(USERS_TABLE),
+            'Key': _to_dynamodb({'email': order['user_email']}),
+            'UpdateExpression': 'ADD total_orders :one, total_spent :total',
+            'ExpressionAttributeValues': _to_dynamodb({':one': 1, ':total': order['total_amount']})
+        }})
+        for i in items:
+            actions.append({'Delete': {
+                'TableName': self.store.table_name(CART_TABLE),
+                'Key': _to_dynamodb({'user_email': order['user_email'], 'product_id': i['product_id']})
+            }})
+
+        try:
+            self.store.client.transact_write_items(TransactItems=actions, ClientRequestToken=order['order_id'])
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons', [])
+            for i, reason in zip(items, reasons):
+                if reason.get('Code') == 'ConditionalCheckFailed':
+                    product = _from_dynamodb(reason['Item']) if reason.get('Item') else {}
+                    if product and product.get('stock', 0) >= i['quantity']:
+                        raise PriceChangedError(i)
+                    raise OutOfStockError(i)
+            order_reason = reasons[len(items)] if len(reasons) > len(items) else {}
+            if order_reason.get('Code') == 'ConditionalCheckFailed':
+                raise DuplicateOrderError(order['order_id'])
+            raise
+
+    def get(self, order_id):
+        return self.table.get_item(Key={'order_id': order_id}).get('Item')
+
+    def page_for_user(self, user_email, limit, start_key=None):
+        kwargs = {
+            'IndexName': USER_ORDERS_INDEX,
+            'KeyConditionExpression': Key('user_email').eq(user_email),
+            'ScanIndexForward': False,
+            'Limit': limit
+        }
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        return query_page(self.table, **kwargs)
+
+
+class DynamoDBContactRepo(ContactRepo):
+
+    def __init__(self, store):
+        self.store = store
+        self.table = store.table(CONTACT_MESSAGES_TABLE)
+
+    def add(self, message):
+        self.table.put_item(Item=message)
+
+    def add_many(self, messages):
+        self.store.batch_write(self.table.table_name, [{'PutRequest': {'Item': m}} for m in messages])
+
+
+# ============================================================================
+# BACKEND
+# ============================================================================
+
+class DynamoDBRepositories(Repositories):
+
+    backend = 'dynamodb'
+
+    def __init__(self, region=None, scan_segments=1, instrument_client=None):
+        """``instrument_client`` is called with every boto3 client created
+        (the resource's included), e.g. to register metrics hooks"""
+        self.region = region or os.getenv('AWS_REGION', 'ap-south-1')
+        self.scan_segments = scan_segments
+        instrument = instrument_client or (lambda client: client)
+
+        def make_resource():
+            resource = boto3.resource('dynamodb', **self._boto3_kwargs())
+            instrument(resource.meta.client)
+            return resource
+
+        self.dynamodb = LazyHandle(make_resource)
+        self.client = LazyHandle(lambda: instrument(boto3.client('dynamodb', **self._boto3_kwargs())))
+        self._tables = {}
+        super().__init__(
+            products=DynamoDBProductRepo(self),
+            users=DynamoDBUserRepo(self),
+            carts=DynamoDBCartRepo(self),
+            orders=DynamoDBOrderRepo(self),
+            contacts=DynamoDBContactRepo(self)
+        )
+
+    def _boto3_kwargs(self):
+        return {
+            'region_name': self.region,
+            'aws_access_key_id': os.getenv('AWS_ACCESS_KEY_ID'),
+            'aws_secret_access_key': os.getenv('AWS_SECRET_ACCESS_KEY')
+        }
+
+    def table(self, name):
+        if name not in self._tables:
+            self._tables[name] = LazyHandle(lambda: self.dynamodb.Table(name))
+        return self._tables[name]
+
+    @staticmethod
+    def table_name(name):
+        return name
+
+    def batch_write(self, table_name, requests):
+        """Send PutRequest/DeleteRequest entries in BatchWriteItem calls of 25.
+
+        Items DynamoDB hands back as unprocessed (throttling, partition limits)
+        are retried with exponential backoff. Raises RuntimeError if anything is
+        still unprocessed after BATCH_WRITE_RETRIES attempts.
+        """
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            pending = {table_name: requests[start:start + BATCH_WRITE_SIZE]}
+            for attempt in range(BATCH_WRITE_RETRIES + 1):
+                response = self.dynamodb.batch_write_item(RequestItems=pending)
+                pending = response.get('UnprocessedItems') or {}
+                if not pending:
+                    break
+                if attempt < BATCH_WRITE_RETRIES:
+                    time.sleep(BATCH_WRITE_BACKOFF * (2 ** attempt))
+            else:
+                left = sum(len(v) for v in pending.values())
+                raise RuntimeError(f"{left} items still unprocessed in {table_name} after {BATCH_WRITE_RETRIES} retries")
+
+    # ------------------------------------------------------------------
+    # Schema bootstrap
+    # ------------------------------------------------------------------
+
+    TABLE_DEFINITIONS = {
+        PRODUCTS_TABLE: {
+            'KeySchema': [{'AttributeName': 'product_id', 'KeyType': 'HASH'}],
+            'AttributeDefinitions': [
+                {'AttributeName': 'product_id', 'AttributeType': 'S'},
+                {'AttributeName': 'active_category', 'AttributeType': 'S'}
+            ],
+            'GlobalSecondaryIndexes': [PRODUCT_CATEGORY_INDEX_SPEC]
+        },
+        USERS_TABLE: {
+            'KeySchema': [{'AttributeName': 'email', 'KeyType': 'HASH'}],
+            'AttributeDefinitions': [{'AttributeName': 'email', 'AttributeType': 'S'}]
+        },
+        CART_TABLE: {
+            'KeySchema': [
+                {'AttributeName': 'user_email', 'KeyType': 'HASH'},
+                {'AttributeName': 'product_id', 'KeyType': 'RANGE'}
+            ],
+            'AttributeDefinitions': [
+                {'AttributeName': 'user_email', 'AttributeType': 'S'},
+                {'AttributeName': 'product_id', 'AttributeType': 'S'}
+            ]
+        },
+        ORDERS_TABLE: {
+            'KeySchema': [{'AttributeName': 'order_id', 'KeyType': 'HASH'}],
+            'AttributeDefinitions': [
+                {'AttributeName': 'order_id', 'AttributeType': 'S'},
+                {'AttributeName': 'user_email', 'AttributeType': 'S'},
+                {'AttributeName': 'created_at', 'AttributeType': 'S'}
+            ],
+            'GlobalSecondaryIndexes': [USER_ORDERS_INDEX_SPEC]
+        },
+        CONTACT_MESSAGES_TABLE: {
+            'KeySchema': [{'AttributeName': 'message_id', 'KeyType': 'HASH'}],
+            'AttributeDefinitions': [{'AttributeName': 'message_id', 'AttributeType': 'S'}]
+        }
+    }
+
+    def init_schema(self):
+        """Create missing tables and GSIs, then wait until all are ACTIVE"""
+        existing_tables = self.client.list_tables()['TableNames']
+        log.info("Existing DynamoDB tables: %s", existing_tables)
+
+        for name, definition in self.TABLE_DEFINITIONS.items():
+            if name not in existing_tables:
+                log.info("Creating %s table", name)
+                try:
+                    self.dynamodb.create_table(TableName=name, BillingMode='PAY_PER_REQUEST', **definition)
+                    log.info("%s table created", name)
+                except Exception as e:
+                    log.error("Error creating %s table: %s", name, e)
+            else:
+                log.info("%s table already exists", name)
+                for index in definition.get('GlobalSecondaryIndexes', []):
+                    index_keys = {k['AttributeName'] for k in index['KeySchema']}
+                    self.ensure_global_index(name, index, [
+                        a for a in definition['AttributeDefinitions'] if a['AttributeName'] in index_keys
+                    ])
+
+        log.info("Waiting for tables to be active")
+        self.wait_for_tables(list(self.TABLE_DEFINITIONS))
+        self.products.backfill_index_keys()
+        log.info("All tables ready")
+
+    def ensure_global_index(self, table_name, index_spec, attribute_definitions):
+        """Add a GSI to a table that was created before the index existed"""
+        index_name = index_spec['IndexName']
+        try:
+            table = self.client.describe_table(TableName=table_name)['Table']
+            indexes = [i['IndexName'] for i in table.get('GlobalSecondaryIndexes', [])]
+            if index_name in indexes:
+                return
+            log.info("Creating %s on %s", index_name, table_name)
+            self.client.update_table(
+                TableName=table_name,
+                AttributeDefinitions=attribute_definitions,
+                GlobalSecondaryIndexUpdates=[{'Create': index_spec}]
+            )
+            log.info("%s is being built", index_name)
+        except Exception as e:
+            log.error("Error creating %s: %s", index_name, e)
+
+    def wait_for_tables(self, table_names):
+        """Block until the tables and all their GSIs are ACTIVE"""
+        waiter = self.client.get_waiter('table_exists')
+        for table_name in table_names:
+            waiter.wait(TableName=table_name, WaiterConfig={'Delay': 2, 'MaxAttempts': 60})
+            # New GSIs on an existing table backfill while the table itself is ACTIVE
+            while True:
+                table = self.client.describe_table(TableName=table_name)['Table']
+                building = [i['IndexName'] for i in table.get('GlobalSecondaryIndexes', [])
+                            if i.get('IndexStatus') != 'ACTIVE']
+                if not building:
+                    break
+                log.info("Waiting for %s on %s", ', '.join(building), table_name)
+                time.sleep(5)
+
+    def warm_up(self):
+        self.dynamodb.resolve()
+        self.client.resolve()
+        for table in self._tables.values():
+            table.resolve()
+
+    def describe(self):
+        return {
+            'backend': self.backend,
+            'region': self.region,
+            'all_tables_in_aws': self.client.list_tables()['TableNames'],
+            'app_table_references': {
+                'users': self.users.table.table_name,
+                'products': self.products.table.table_name,
+                'cart': self.carts.table.table_name,
+                'orders': self.orders.table.table_name,
+                'contact': self.contacts.table.table_name
+            }
+        }
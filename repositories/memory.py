@@ -0,0 +1,215 @@
+"""In-memory backend for tests, benchmarks and throwaway dev servers.
+
+Everything lives in dicts behind one lock; items are deep-copied on the way
+in and out so callers can never mutate stored state by accident.
+"""
+
+import copy
+import threading
+from decimal import Decimal
+
+from .base import (
+    CartRepo, ContactRepo, DuplicateOrderError, MAX_CART_QUANTITY, OrderRepo, OutOfStockError,
+    PriceChangedError, ProductRepo, Repositories, UserRepo, listing_view, new_cart_row, to_item,
+    with_product_index_keys
+)
+
+
+class MemoryProductRepo(ProductRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def _active(self, category_key=None):
+        items = [p for p in self.store.product_items.values()
+                 if p.get('active_category') and (category_key is None or p['active_category'] == category_key)]
+        return sorted(items, key=lambda p: p['product_id'])
+
+    def list_active(self):
+        with self.store.lock:
+            return [listing_view(copy.deepcopy(p)) for p in self._active()]
+
+    def list_active_by_category(self, category_key):
+        with self.store.lock:
+            return [listing_view(copy.deepcopy(p)) for p in self._active(category_key)]
+
+    def get(self, product_id):
+        with self.store.lock:
+            return copy.deepcopy(self.store.product_items.get(str(product_id)))
+
+    def get_many(self, product_ids):
+        with self.store.lock:
+            return {str(p): copy.deepcopy(self.store.product_items[str(p)])
+                    for p in product_ids if str(p) in self.store.product_items}
+
+    def list_all(self):
+        with self.store.lock:
+            return copy.deepcopy(list(self.store.product_items.values()))
+
+    def put_many(self, products):
+        with self.store.lock:
+            for product in products:
+                item = to_item(with_product_index_keys(product))
+                self.store.product_items[item['product_id']] = item
+
+    def is_empty(self):
+        return not self.store.product_items
+
+
+class MemoryUserRepo(UserRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, email):
+        with self.store.lock:
+            return copy.deepcopy(self.store.user_items.get(email))
+
+    def put(self, user):
+        self.put_many([user])
+
+    def put_many(self, users):
+        with self.store.lock:
+            for user in users:
+                self.store.user_items[user['email']] = to_item(user)
+
+    def update_profile(self, email, name, phone, address):
+        with self.store.lock:
+            user = self.store.user_items.setdefault(email, {'email': email})
+            user.update(name=name, phone=phone, address=address)
+
+    def update_password(self, email, password_hash):
+        with self.store.lock:
+            self.store.user_items.setdefault(email, {'email': email})['password'] = password_hash
+
+    def list_all(self):
+        with self.store.lock:
+            return copy.deepcopy(list(self.store.user_items.values()))
+
+
+class MemoryCartRepo(CartRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def list(self, user_email):
+        with self.store.lock:
+            rows = self.store.cart_rows.get(user_email, {})
+            return copy.deepcopy([rows[k] for k in sorted(rows)])
+
+    def _upsert(self, user_email, product, quantity, added_at, replace=False):
+        rows = self.store.cart_rows.setdefault(user_email, {})
+        row = rows.get(product['product_id'])
+        if row:
+            if replace:
+                row['quantity'] = Decimal(quantity)
+            else:
+                row['quantity'] = min(row['quantity'] + quantity, Decimal(MAX_CART_QUANTITY))
+        else:
+            rows[product['product_id']] = to_item(new_cart_row(user_email, product, quantity, added_at))
+
+    def add(self, user_email, product, quantity, added_at):
+        with self.store.lock:
+            self._upsert(user_email, product, quantity, added_at)
+
+    def add_many(self, user_email, lines, added_at):
+        with self.store.lock:
+            for product, quantity in lines:
+                self._upsert(user_email, product, quantity, added_at)
+
+    def set_quantities(self, user_email, changes, added_at):
+        with self.store.lock:
+            for product_id, product, quantity in changes:
+                if quantity == 0:
+                    self.store.cart_rows.get(user_email, {}).pop(product_id, None)
+                else:
+                    self._upsert(user_email, product, quantity, added_at, replace=True)
+
+    def remove(self, user_email, product_id):
+        with self.store.lock:
+            self.store.cart_rows.get(user_email, {}).pop(product_id, None)
+
+    def put_many(self, rows):
+        with self.store.lock:
+            for row in rows:
+                self.store.cart_rows.setdefault(row['user_email'], {})[row['product_id']] = to_item(row)
+
+
+class MemoryOrderRepo(OrderRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def place(self, order):
+        order = to_item(order)
+        with self.store.lock:
+            if order['order_id'] in self.store.order_items:
+                raise DuplicateOrderError(order['order_id'])
+            products = self.store.product_items
+            for line in order['items']:
+                product = products.get(line['product_id'])
+                if not product or product.get('stock', 0) < line['quantity']:
+                    raise OutOfStockError(line)
+                if product.get('price') != line['price']:
+                    raise PriceChangedError(line)
+            for line in order['items']:
+                products[line['product_id']]['stock'] -= line['quantity']
+            self.store.order_items[order['order_id']] = order
+            user = self.store.user_items.setdefault(order['user_email'], {'email': order['user_email']})
+            user['total_orders'] = user.get('total_orders', 0) + 1
+            user['total_spent'] = user.get('total_spent', 0) + order['total_amount']
+            cart = self.store.cart_rows.get(order['user_email'], {})
+            for line in order['items']:
+                cart.pop(line['product_id'], None)
+
+    def get(self, order_id):
+        with self.store.lock:
+            return copy.deepcopy(self.store.order_items.get(order_id))
+
+    def page_for_user(self, user_email, limit, start_key=None):
+        with self.store.lock:
+            orders = sorted((o for o in self.store.order_items.values() if o['user_email'] == user_email),
+                            key=lambda o: (o['created_at'], o['order_id']), reverse=True)
+            if start_key:
+                after = (start_key['created_at'], start_key['order_id'])
+                orders = [o for o in orders if (o['created_at'], o['order_id']) < after]
+            page = copy.deepcopy(orders[:limit])
+        next_key = None
+        if len(orders) > limit:
+            last = page[-1]
+            next_key = {'order_id': last['order_id'], 'user_email': user_email, 'created_at': last['created_at']}
+        return page, next_key
+
+
+class MemoryContactRepo(ContactRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, message):
+        self.add_many([message])
+
+    def add_many(self, messages):
+        with self.store.lock:
+            for message in messages:
+                self.store.message_items[message['message_id']] = to_item(message)
+
+
+class MemoryRepositories(Repositories):
+
+    backend = 'memory'
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.product_items = {}
+        self.user_items = {}
+        self.cart_rows = {}
+        self.order_items = {}
+        self.message_items = {}
+        super().__init__(
+            products=MemoryProductRepo(self),
+            users=MemoryUserRepo(self),
+            carts=MemoryCartRepo(self),
+            orders=MemoryOrderRepo(self),
+            contacts=MemoryContactRepo(self)
+        )
@@ -0,0 +1,314 @@
+"""SQLite backend: a single local file in WAL mode.
+
+Each entity is stored as a JSON document next to the columns it is looked up
+by, mirroring the DynamoDB keys and indexes, so an edge or dev node can run
+the whole app with no network round trips.
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from .base import (
+    CartRepo, ContactRepo, DuplicateOrderError, MAX_CART_QUANTITY, OrderRepo, OutOfStockError,
+    PriceChangedError, ProductRepo, Repositories, UserRepo, listing_view, new_cart_row, to_item,
+    with_product_index_keys
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_id TEXT PRIMARY KEY,
+    active_category TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_active_category ON products (active_category, product_id);
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cart (
+    user_email TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_email, product_id)
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    user_email TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_user_created ON orders (user_email, created_at, order_id);
+CREATE TABLE IF NOT EXISTS contact_messages (
+    message_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _dumps(item):
+    return json.dumps(item, default=_json_default, separators=(',', ':'))
+
+
+def _loads(data):
+    return json.loads(data, parse_float=Decimal, parse_int=Decimal)
+
+
+class SqliteProductRepo(ProductRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def list_active(self):
+        rows = self.store.query('SELECT data FROM products WHERE active_category IS NOT NULL')
+        return [listing_view(_loads(data)) for data, in rows]
+
+    def list_active_by_category(self, category_key):
+        rows = self.store.query('SELECT data FROM products WHERE active_category = ? ORDER BY product_id',
+                                (category_key,))
+        return [listing_view(_loads(data)) for data, in rows]
+
+    def get(self, product_id):
+        rows = self.store.query('SELECT data FROM products WHERE product_id = ?', (str(product_id),))
+        return _loads(rows[0][0]) if rows else None
+
+    def get_many(self, product_ids):
+        ids = list(dict.fromkeys(str(p) for p in product_ids))
+        if not ids:
+            return {}
+        rows = self.store.query(
+            f"SELECT data FROM products WHERE product_id IN ({','.join('?' * len(ids))})", ids
+        )
+        products = [_loads(data) for data, in rows]
+        return {p['product_id']: p for p in products}
+
+    def list_all(self):
+        return [_loads(data) for data, in self.store.query('SELECT data FROM products')]
+
+    def put_many(self, products):
+        with self.store.transaction() as conn:
+            for product in products:
+                item = to_item(with_product_index_keys(product))
+                conn.execute('INSERT OR REPLACE INTO products (product_id, active_category, data) VALUES (?, ?, ?)',
+                             (item['product_id'], item.get('active_category'), _dumps(item)))
+
+    def is_empty(self):
+        return not self.store.query('SELECT 1 FROM products LIMIT 1')
+
+
+class SqliteUserRepo(UserRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, email):
+        rows = self.store.query('SELECT data FROM users WHERE email = ?', (email,))
+        return _loads(rows[0][0]) if rows else None
+
+    def put(self, user):
+        self.put_many([user])
+
+    def put_many(self, users):
+        with self.store.transaction() as conn:
+            for user in users:
+                conn.execute('INSERT OR REPLACE INTO users (email, data) VALUES (?, ?)',
+                             (user['email'], _dumps(to_item(user))))
+
+    def update_profile(self, email, name, phone, address):
+        with self.store.transaction() as conn:
+            row = conn.execute('SELECT data FROM users WHERE email = ?', (email,)).fetchone()
+            user = _loads(row[0]) if row else {'email': email}
+            user.update(name=name, phone=phone, address=address)
+            conn.execute('INSERT OR REPLACE INTO users (email, data) VALUES (?, ?)', (email, _dumps(user)))
+
+    def update_password(self, email, password_hash):
+        with self.store.transaction() as conn:
+            row = conn.execute('SELECT data FROM users WHERE email = ?', (email,)).fetchone()
+            user = _loads(row[0]) if row else {'email': email}
+            user['password'] = password_hash
+            conn.execute('INSERT OR REPLACE INTO users (email, data) VALUES (?, ?)', (email, _dumps(user)))
+
+    def list_all(self):
+        return [_loads(data) for data, in self.store.query('SELECT data FROM users')]
+
+
+class SqliteCartRepo(CartRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def list(self, user_email):
+        rows = self.store.query('SELECT data FROM cart WHERE user_email = ? ORDER BY product_id', (user_email,))
+        return [_loads(data) for data, in rows]
+
+    @staticmethod
+    def _upsert(conn, user_email, product, quantity, added_at, replace=False):
+        row = conn.execute('SELECT data FROM cart WHERE user_email = ? AND product_id = ?',
+                           (user_email, product['product_id'])).fetchone()
+        if row:
+            item = _loads(row[0])
+            if replace:
+                item['quantity'] = Decimal(quantity)
+            else:
+                item['quantity'] = min(item['quantity'] + quantity, Decimal(MAX_CART_QUANTITY))
+        else:
+            item = to_item(new_cart_row(user_email, product, quantity, added_at))
+        conn.execute('INSERT OR REPLACE INTO cart (user_email, product_id, data) VALUES (?, ?, ?)',
+                     (user_email, product['product_id'], _dumps(item)))
+
+    def add(self, user_email, product, quantity, added_at):
+        with self.store.transaction() as conn:
+            self._upsert(conn, user_email, product, quantity, added_at)
+
+    def add_many(self, user_email, lines, added_at):
+        with self.store.transaction() as conn:
+            for product, quantity in lines:
+                self._upsert(conn, user_email, product, quantity, added_at)
+
+    def set_quantities(self, user_email, changes, added_at):
+        with self.store.transaction() as conn:
+            for product_id, product, quantity in changes:
+                if quantity == 0:
+                    conn.execute('DELETE FROM cart WHERE user_email = ? AND product_id = ?', (user_email, product_id))
+                else:
+                    self._upsert(conn, user_email, product, quantity, added_at, replace=True)
+
+    def remove(self, user_email, product_id):
+        with self.store.transaction() as conn:
+            conn.execute('DELETE FROM cart WHERE user_email = ? AND product_id = ?', (user_email, product_id))
+
+    def put_many(self, rows):
+        with self.store.transaction() as conn:
+            for row in rows:
+                conn.execute('INSERT OR REPLACE INTO cart (user_email, product_id, data) VALUES (?, ?, ?)',
+                             (row['user_email'], row['product_id'], _dumps(to_item(row))))
+
+
+class SqliteOrderRepo(OrderRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def place(self, order):
+        order = to_item(order)
+        with self.store.transaction() as conn:
+            if conn.execute('SELECT 1 FROM orders WHERE order_id = ?', (order['order_id'],)).fetchone():
+                raise DuplicateOrderError(order['order_id'])
+            for line in order['items']:
+                row = conn.execute('SELECT data FROM products WHERE product_id = ?',
+                                   (line['product_id'],)).fetchone()
+                product = _loads(row[0]) if row else None
+                if not product or product.get('stock', 0) < line['quantity']:
+                    raise OutOfStockError(line)
+                if product.get('price') != line['price']:
+                    raise PriceChangedError(line)
+                product['stock'] -= line['quantity']
+                conn.execute('UPDATE products SET data = ? WHERE product_id = ?',
+                             (_dumps(product), line['product_id']))
+            conn.execute('INSERT INTO orders (order_id, user_email, created_at, data) VALUES (?, ?, ?, ?)',
+                         (order['order_id'], order['user_email'], order['created_at'], _dumps(order)))
+            row = conn.execute('SELECT data FROM users WHERE email = ?', (order['user_email'],)).fetchone()
+            user = _loads(row[0]) if row else {'email': order['user_email']}
+            user['total_orders'] = user.get('total_orders', 0) + 1
+            user['total_spent'] = user.get('total_spent', 0) + order['total_amount']
+            conn.execute('INSERT OR REPLACE INTO users (email, data) VALUES (?, ?)',
+                         (order['user_email'], _dumps(user)))
+            conn.executemany('DELETE FROM cart WHERE user_email = ? AND product_id = ?',
+                             [(order['user_email'], line['product_id']) for line in order['items']])
+
+    def get(self, order_id):
+        rows = self.store.query('SELECT data FROM orders WHERE order_id = ?', (order_id,))
+        return _loads(rows[0][0]) if rows else None
+
+    def page_for_user(self, user_email, limit, start_key=None):
+        if start_key:
+            rows = self.store.query(
+                'SELECT order_id, created_at, data FROM orders WHERE user_email = ? '
+                'AND (created_at < ? OR (created_at = ? AND order_id < ?)) '
+                'ORDER BY created_at DESC, order_id DESC LIMIT ?',
+                (user_email, start_key['created_at'], start_key['created_at'], start_key['order_id'], limit + 1)
+            )
+        else:
+            rows = self.store.query(
+                'SELECT order_id, created_at, data FROM orders WHERE user_email = ? '
+                'ORDER BY created_at DESC, order_id DESC LIMIT ?', (user_email, limit + 1)
+            )
+        orders = [_loads(data) for _, _, data in rows[:limit]]
+        next_key = None
+        if len(rows) > limit:
+            order_id, created_at, _ = rows[limit - 1]
+            next_key = {'order_id': order_id, 'user_email': user_email, 'created_at': created_at}
+        return orders, next_key
+
+
+class SqliteContactRepo(ContactRepo):
+
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, message):
+        self.add_many([message])
+
+    def add_many(self, messages):
+        with self.store.transaction() as conn:
+            for message in messages:
+                conn.execute('INSERT OR REPLACE INTO contact_messages (message_id, data) VALUES (?, ?)',
+                             (message['message_id'], _dumps(to_item(message))))
+
+
+class SqliteRepositories(Repositories):
+
+    backend = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        super().__init__(
+            products=SqliteProductRepo(self),
+            users=SqliteUserRepo(self),
+            carts=SqliteCartRepo(self),
+            orders=SqliteOrderRepo(self),
+            contacts=SqliteContactRepo(self)
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def query(self, sql, params=()):
+        return self._conn().execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def init_schema(self):
+        self._conn().executescript(SCHEMA)
+
+    def warm_up(self):
+        self._conn()
+
+    def describe(self):
+        tables = [name for name, in self.query("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        return {'backend': self.backend, 'path': self.path, 'tables': tables}
@@ -0,0 +1,195 @@
+"""In-memory product search.
+
+An inverted index over product name, category and description, kept in step
+with the catalog cache: every time the cache reloads the catalog the index
+is synced against it, re-indexing only products whose text changed. Queries
+never touch the store.
+
+Each query word matches indexed terms exactly, as a prefix (so the last word
+autocompletes as the user types) or within one typo (insert, delete,
+substitute or swap two adjacent letters). A product must match every query
+word; results are ranked by which fields matched and how closely.
+"""
+
+import bisect
+import re
+import threading
+
+# How much a term found in each field counts towards a product's score
+FIELD_WEIGHTS = {'name': 3.0, 'category': 2.0, 'description': 1.0}
+# How much each kind of match is worth relative to an exact one
+EXACT, PREFIX, FUZZY = 1.0, 0.6, 0.4
+# Shortest query word that gets typo-tolerant matching
+MIN_FUZZY_LENGTH = 3
+# Cap on the terms one short prefix can expand to
+MAX_PREFIX_TERMS = 64
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text or '').lower())
+
+
+def _deletes(term):
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def within_one_edit(a, b):
+    """True if ``a`` and ``b`` differ by at most one insert, delete,
+    substitution or adjacent swap"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        return a[i + 1:] == b[i + 1:] or (i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i]
+                                          and a[i + 2:] == b[i + 2:])
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}  # term -> {product_id: weight}
+        self._terms = []  # sorted, for prefix lookups
+        self._deletes = {}  # term with one letter removed -> {terms}
+        self._docs = {}  # product_id -> (signature, {term: weight}, listing)
+        self.version = 0
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _signature(product):
+        return tuple(str(product.get(field, '')) for field in FIELD_WEIGHTS)
+
+    @staticmethod
+    def _weights(product):
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(product.get(field)):
+                weights[term] = max(weights.get(term, 0.0), weight)
+        return weights
+
+    def _add_term(self, term):
+        bisect.insort(self._terms, term)
+        for variant in _deletes(term) | {term}:
+            self._deletes.setdefault(variant, set()).add(term)
+
+    def _drop_term(self, term):
+        index = bisect.bisect_left(self._terms, term)
+        if index < len(self._terms) and self._terms[index] == term:
+            del self._terms[index]
+        for variant in _deletes(term) | {term}:
+            terms = self._deletes.get(variant)
+            if terms:
+                terms.discard(term)
+                if not terms:
+                    del self._deletes[variant]
+
+    def _unindex(self, product_id):
+        _, weights, _ = self._docs.pop(product_id)
+        for term in weights:
+            postings = self._postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                self._drop_term(term)
+
+    def _index(self, product, signature):
+        product_id = product['product_id']
+        weights = self._weights(product)
+        for term, weight in weights.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                self._add_term(term)
+            self._postings[term][product_id] = weight
+        self._docs[product_id] = (signature, weights, product)
+
+    def sync(self, products):
+        """Bring the index in line with ``products`` (the full active
+        catalog); returns how many products were (re)indexed or removed"""
+        with self._lock:
+            seen = set()
+            changed = 0
+            for product in products:
+                product_id = product['product_id']
+                seen.add(product_id)
+                signature = self._signature(product)
+                doc = self._docs.get(product_id)
+                if doc and doc[0] == signature:
+                    # Same text; just keep price/stock in the results current
+                    self._docs[product_id] = (signature, doc[1], product)
+                    continue
+                if doc:
+                    self._unindex(product_id)
+                self._index(product, signature)
+                changed += 1
+            for product_id in [p for p in self._docs if p not in seen]:
+                self._unindex(product_id)
+                changed += 1
+            if changed:
+                self.version += 1
+            return changed
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _expand(self, word, prefix):
+        """``{term: match quality}`` for one query word"""
+        matches = {}
+        if word in self._postings:
+            matches[word] = EXACT
+        if prefix:
+            start = bisect.bisect_left(self._terms, word)
+            for term in self._terms[start:start + MAX_PREFIX_TERMS]:
+                if not term.startswith(word):
+                    break
+                matches.setdefault(term, PREFIX)
+        if len(word) >= MIN_FUZZY_LENGTH:
+            candidates = set(self._deletes.get(word, ()))
+            for variant in _deletes(word):
+                candidates |= self._deletes.get(variant, set())
+            for term in candidates:
+                if term not in matches and within_one_edit(word, term):
+                    matches[term] = FUZZY
+        return matches
+
+    def search(self, query, limit=10):
+        """Ranked ``[{**listing, 'score': float}, ...]`` for ``query``"""
+        words = tokenize(query)
+        if not words:
+            return []
+        with self._lock:
+            scores = None
+            for position, word in enumerate(words):
+                # Only the word being typed autocompletes
+                matches = self._expand(word, prefix=position == len(words) - 1)
+                word_scores = {}
+                for term, quality in matches.items():
+                    for product_id, weight in self._postings[term].items():
+                        score = weight * quality
+                        if score > word_scores.get(product_id, 0.0):
+                            word_scores[product_id] = score
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {p: s + word_scores[p] for p, s in scores.items() if p in word_scores}
+                if not scores:
+                    return []
+            # Ties go to the lower product id ('2' before '10')
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], len(item[0]), item[0]))[:limit]
+            return [dict(self._docs[product_id][2], score=round(score, 3)) for product_id, score in ranked]
+
+    def stats(self):
+        return {'products': len(self._docs), 'terms': len(self._terms), 'version': self.version}
@@ -0,0 +1,209 @@
+"""Server-side Flask sessions.
+
+The cookie only carries a signed, opaque session id; the session data lives
+in a local store (SQLite file or in-process memory) with TTL expiry and LRU
+eviction, so request sizes stay flat however much is kept in the session.
+"""
+
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class SessionStore:
+    """Backend interface: map a session id to serialized session data"""
+
+    def get(self, sid):
+        raise NotImplementedError
+
+    def save(self, sid, data, ttl):
+        raise NotImplementedError
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU store; fine for a single worker or for development"""
+
+    def __init__(self, max_sessions=10000):
+        self.max_sessions = max_sessions
+        self._data = OrderedDict()  # sid -> (data, expires)
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return entry[0]
+
+    def save(self, sid, data, ttl):
+        with self._lock:
+            self._data[sid] = (data, time.time() + ttl)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+
+class SqliteSessionStore(SessionStore):
+    """SQLite-file store shared by every worker process on the host"""
+
+    # Only refresh the LRU timestamp this often, so reads stay reads
+    TOUCH_INTERVAL = 60
+    # Run expiry/eviction once every this many saves
+    SWEEP_EVERY = 200
+
+    def __init__(self, path, max_sessions=100000):
+        self.path = path
+        self.max_sessions = max_sessions
+        self._local = threading.local()
+        self._saves = 0
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'sid TEXT PRIMARY KEY, data TEXT NOT NULL, '
+            'expires REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        now = time.time()
+        row = self._conn().execute(
+            'SELECT data, expires, accessed FROM sessions WHERE sid = ?', (sid,)
+        ).fetchone()
+        if row is None:
+            return None
+        data, expires, accessed = row
+        if expires < now:
+            self.delete(sid)
+            return None
+        if now - accessed > self.TOUCH_INTERVAL:
+            self._conn().execute('UPDATE sessions SET accessed = ? WHERE sid = ?', (now, sid))
+        return data
+
+    def save(self, sid, data, ttl):
+        now = time.time()
+        self._conn().execute(
+            'INSERT OR REPLACE INTO sessions (sid, data, expires, accessed) VALUES (?, ?, ?, ?)',
+            (sid, data, now + ttl, now)
+        )
+        self._saves += 1
+        if self._saves % self.SWEEP_EVERY == 0:
+            self.sweep()
+
+    def delete(self, sid):
+        self._conn().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def sweep(self):
+        """Drop expired sessions, then the least recently used beyond the cap"""
+        conn = self._conn()
+        conn.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),))
+        conn.execute(
+            'DELETE FROM sessions WHERE sid IN ('
+            'SELECT sid FROM sessions ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            (self.max_sessions,)
+        )
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the session to a fresh id (call on login to prevent fixation)"""
+        if self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='freshbasket-session')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            if sid:
+                data = self.store.get(sid)
+                if data is not None:
+                    try:
+                        return ServerSideSession(self.serializer.loads(data), sid=sid)
+                    except ValueError:
+                        pass
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.modified:
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), self.ttl)
+        if not (session.modified or self.should_set_cookie(app, session)):
+            return
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid.encode('ascii')).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
@@ -68,11 +68,15 @@ function updateQuantity(productId, quantity) {
 
 function updateCartCount() {
     // Update cart count in navbar
-    const cartCount = document.getElementById('cartCount');
-    if (cartCount) {
-        const currentCount = parseInt(cartCount.textContent) || 0;
-        cartCount.textContent = currentCount + 1;
-    }
+    fetch('/api/cart/summary')
+        .then(response => response.ok ? response.json() : null)
+        .then(summary => {
+            if (!summary) return;
+            const cartCount = document.getElementById('cartCount');
+            if (cartCount) {
+                cartCount.textContent = summary.count;
+            }
+        });
 }
 
 // Notification System
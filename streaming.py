@@ -0,0 +1,170 @@
+"""Streamed page rendering and response compression.
+
+``stream_page`` renders a template incrementally: the first few kilobytes
+(the document head, stylesheet links and navigation) go out as soon as they
+are rendered, then the rest follows in ``chunk_bytes`` pieces while the
+template is still walking its product iterator. The time to first byte no
+longer depends on how many products the page lists.
+
+``ResponseCompressor`` gzip- or brotli-encodes text responses by the
+client's Accept-Encoding. Streamed bodies are compressed chunk by chunk with
+a sync flush after each, so every chunk still reaches the browser at once.
+Responses that are already encoded (the precompressed static assets) or
+passed straight through from files are left alone. Brotli needs the brotli
+package; without it only gzip is offered.
+"""
+
+import gzip
+import zlib
+
+from flask import current_app, request, stream_template
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The head of base.html renders to about this much
+FIRST_CHUNK_BYTES = 2048
+CHUNK_BYTES = 16 * 1024
+COMPRESSIBLE = {'text/html', 'text/plain', 'text/css', 'text/javascript', 'application/javascript',
+                'application/json', 'image/svg+xml'}
+
+
+def buffered(events, first_chunk=FIRST_CHUNK_BYTES, chunk_bytes=CHUNK_BYTES):
+    """Join Jinja's many small string events into UTF-8 chunks, the first
+    one small so the page head is sent right away"""
+    parts, size, limit = [], 0, first_chunk
+    for event in events:
+        parts.append(event)
+        size += len(event)
+        if size >= limit:
+            yield ''.join(parts).encode('utf-8')
+            parts, size, limit = [], 0, chunk_bytes
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def stream_page(template_name, **context):
+    """A streamed ``text/html`` response for ``template_name``; context may
+    hold lazy iterators, which are consumed while the page is sent.
+
+    Session changes made while rendering are lost (the session is saved
+    before the body is sent), so pages with a flash waiting must be rendered
+    the usual way."""
+    return current_app.response_class(buffered(stream_template(template_name, **context)), mimetype='text/html')
+
+
+class _GzipStream:
+
+    def __init__(self, level):
+        self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._zlib.flush()
+
+
+class _BrotliStream:
+
+    def __init__(self, quality):
+        self._brotli = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._brotli.process(data) + self._brotli.flush()
+
+    def finish(self):
+        return self._brotli.finish()
+
+
+class ResponseCompressor:
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5, mimetypes=COMPRESSIBLE):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = set(mimetypes)
+        self.compressed = 0
+        self.streamed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def init_app(self, app):
+        app.after_request(self._compress)
+
+    def _encoding(self):
+        encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        for encoding in encodings:
+            if request.accept_encodings.quality(encoding) > 0:
+                return encoding
+        return None
+
+    def _compress(self, response):
+        if (response.status_code not in (200, 304) or response.direct_passthrough or response.content_encoding
+                or response.mimetype not in self.mimetypes or response.cache_control.no_transform):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self._encoding()
+        if encoding is None:
+            return response
+        if response.status_code == 304:
+            # Same validator as the encoded 200 it stands for
+            self._weaken_etag(response)
+            return response
+        if response.is_streamed:
+            response.response = self._compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+            self.streamed += 1
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            if encoding == 'br':
+                compressed = brotli.compress(data, quality=self.brotli_quality)
+            else:
+                compressed = gzip.compress(data, self.gzip_level, mtime=0)
+            response.set_data(compressed)
+            self.compressed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(compressed)
+        response.content_encoding = encoding
+        self._weaken_etag(response)
+        return response
+
+    @staticmethod
+    def _weaken_etag(response):
+        # The encoded bytes differ from the identity ones; a weak validator
+        # still matches either on revalidation (as nginx does)
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+    def _compress_stream(self, chunks, encoding):
+        stream = _BrotliStream(self.brotli_quality) if encoding == 'br' else _GzipStream(self.gzip_level)
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = stream.compress(chunk)
+                self.bytes_in += len(chunk)
+                self.bytes_out += len(data)
+                if data:
+                    yield data
+            data = stream.finish()
+            self.bytes_out += len(data)
+            yield data
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def stats(self):
+        return {
+            'brotli': brotli is not None,
+            'compressed': self.compressed,
+            'streamed': self.streamed,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out
+        }
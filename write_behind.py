@@ -0,0 +1,218 @@
+"""Write-behind queue for fire-and-forget writes.
+
+``enqueue(kind, item)`` appends the item to an SQLite spool file and returns;
+a background thread drains the spool through the writer registered for that
+kind (e.g. ``repos.contacts.add_many``, one BatchWriteItem per 25 items).
+Items are flushed once ``flush_size`` are waiting or ``flush_interval``
+seconds have passed, whichever comes first.
+
+Items stay in the spool until their write succeeds, so they survive restarts
+and store outages. A failed batch is retried with exponential backoff; after
+``max_attempts`` its items are parked as dead (kept, counted, and logged)
+rather than blocking the queue. When the spool is full, ``enqueue`` raises
+``SpoolFull`` and the caller should write synchronously instead.
+
+The flusher thread starts with ``start()`` or, at the latest, on the first
+``enqueue`` in a process, so whatever entry point serves the app, spooled
+items are always drained.
+
+Writers must be idempotent (plain puts keyed by an id), since a batch that
+fails partway or is claimed again after a crash is sent again.
+"""
+
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger('freshbasket.write_behind')
+
+# A claimed batch not finished within this long (worker died) is retried
+CLAIM_TIMEOUT = 60
+MAX_BACKOFF = 60
+
+
+class SpoolFull(Exception):
+    """The spool holds ``max_items`` already; write synchronously"""
+
+
+class WriteBehindQueue:
+
+    def __init__(self, path, flush_size=25, flush_interval=1.0, max_items=100000, max_attempts=20,
+                 backoff=0.5):
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_items = max_items
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._writers = {}
+        self._local = threading.local()
+        self._wake = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._atexit = False
+        self._stopping = False
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS spool ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, '
+            'attempts INTEGER NOT NULL DEFAULT 0, not_before REAL NOT NULL DEFAULT 0, '
+            'claimed_at REAL, dead INTEGER NOT NULL DEFAULT 0)'
+        )
+        self.pending = conn.execute('SELECT COUNT(*) FROM spool WHERE dead = 0').fetchone()[0]
+        self.dead = conn.execute('SELECT COUNT(*) FROM spool WHERE dead = 1').fetchone()[0]
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def register(self, kind, writer):
+        """``writer(items)`` stores a list of items or raises"""
+        self._writers[kind] = writer
+        return writer
+
+    def enqueue(self, kind, item):
+        if kind not in self._writers:
+            raise KeyError(f"no writer registered for {kind!r}")
+        if self.pending >= self.max_items:
+            self.rejected += 1
+            raise SpoolFull(f"write-behind spool holds {self.pending} items")
+        self._conn().execute('INSERT INTO spool (kind, payload) VALUES (?, ?)',
+                             (kind, json.dumps(item, default=str)))
+        self.pending += 1
+        self.enqueued += 1
+        self.start()
+        if self.pending >= self.flush_size:
+            with self._wake:
+                self._wake.notify()
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    def _claim(self, limit):
+        """Take up to ``limit`` due items of the oldest waiting kind"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT kind FROM spool WHERE dead = 0 AND not_before <= ? '
+                'AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY seq LIMIT 1',
+                (now, now - CLAIM_TIMEOUT)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None, []
+            kind = row[0]
+            rows = conn.execute(
+                'SELECT seq, payload, attempts FROM spool WHERE kind = ? AND dead = 0 AND not_before <= ? '
+                'AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY seq LIMIT ?',
+                (kind, now, now - CLAIM_TIMEOUT, limit)).fetchall()
+            conn.executemany('UPDATE spool SET claimed_at = ? WHERE seq = ?', [(now, seq) for seq, _, _ in rows])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return kind, rows
+
+    def flush(self):
+        """Write every due item; returns how many were written"""
+        written = 0
+        while True:
+            kind, rows = self._claim(self.flush_size)
+            if not rows:
+                return written
+            conn = self._conn()
+            seqs = [(seq,) for seq, _, _ in rows]
+            writer = self._writers.get(kind)
+            try:
+                if writer is None:
+                    raise KeyError(f"no writer registered for {kind!r}")
+                writer([json.loads(payload) for _, payload, _ in rows])
+            except Exception as e:
+                self.failures += 1
+                attempts = max(a for _, _, a in rows) + 1
+                if attempts >= self.max_attempts:
+                    conn.executemany('UPDATE spool SET dead = 1, claimed_at = NULL WHERE seq = ?', seqs)
+                    self.dead += len(rows)
+                    self.pending -= len(rows)
+                    log.error("Parked %d %s writes after %d attempts: %s", len(rows), kind, attempts, e,
+                              extra={'event': 'write_behind.dead'})
+                else:
+                    delay = min(MAX_BACKOFF, self.backoff * 2 ** (attempts - 1))
+                    conn.executemany('UPDATE spool SET attempts = ?, not_before = ?, claimed_at = NULL WHERE seq = ?',
+                                     [(attempts, time.time() + delay, seq) for (seq,) in seqs])
+                    log.warning("Write-behind flush of %d %s items failed (attempt %d, retry in %.1fs): %s",
+                                len(rows), kind, attempts, delay, e)
+                return written
+            conn.executemany('DELETE FROM spool WHERE seq = ?', seqs)
+            self.pending = max(0, self.pending - len(rows))
+            self.written += len(rows)
+            self.batches += 1
+            written += len(rows)
+
+    def _run(self):
+        written = 0
+        while not self._stopping:
+            with self._wake:
+                # Go straight on only while full batches are actually going out
+                if not (written and self.pending >= self.flush_size):
+                    self._wake.wait(self.flush_interval)
+            try:
+                written = self.flush()
+                # Other workers on the host share the spool; resync the count
+                self.pending = self._conn().execute('SELECT COUNT(*) FROM spool WHERE dead = 0').fetchone()[0]
+            except Exception:
+                written = 0
+                log.exception("Write-behind flush failed")
+                time.sleep(self.flush_interval)
+
+    def start(self):
+        """Start the flusher unless it is running (a thread started before a
+        fork does not run in the child, so it is started again there)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+            if not self._atexit:
+                atexit.register(self.stop)
+                self._atexit = True
+
+    def stop(self, timeout=5):
+        """Stop the flusher after one last flush; whatever is left stays
+        spooled for the next start"""
+        if self._thread is None:
+            return
+        self._stopping = True
+        with self._wake:
+            self._wake.notify()
+        self._thread.join(timeout)
+        self._thread = None
+        self._stopping = False
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'dead': self.dead,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'failures': self.failures,
+            'rejected': self.rejected
+        }